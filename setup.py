@@ -49,7 +49,6 @@ setup(
         "Intended Audience :: End Users/Desktop",
 
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.3",
         "Programming Language :: Python :: 3.4",
         "Programming Language :: Python :: 3.5",
     ],
@@ -0,0 +1,189 @@
+# coding=utf-8
+
+# Shane - a poor man and/or hipster's TUI screenwriting software
+# Copyright (C) 2016 Tobias Heukäufer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import fcntl
+import heapq
+import os
+import selectors
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Timer(object):
+    """A callback to be called by an event loop every interval seconds."""
+
+    __slots__ = ("when", "interval", "callback")
+
+    def __init__(self, when: float, interval: float, callback):
+        """Initialize timer (first due at when)."""
+        self.when = when
+        self.interval = interval
+        self.callback = callback
+
+    def __lt__(self, other) -> bool:
+        """Return if timer is due before other timer."""
+        return self.when < other.when
+
+
+class EventLoop(object):
+    """A loop calling back for readable files, timers, signals and tasks.
+
+    All callbacks are called from the thread running the loop, one after the
+    other, so they never need to lock anything. Background tasks run in worker
+    threads, only their results are handed back to the loop.
+    """
+
+    # Number of threads running background tasks
+    WORKERS = 2
+
+    def __init__(self):
+        """Initialize event loop."""
+        self._selector = selectors.DefaultSelector()
+        self._timers = []
+        self._running = False
+
+        # Finished background tasks and caught signals wake the loop by
+        # writing to a pipe
+        self._wake_read, self._wake_write = os.pipe()
+        for fd in (self._wake_read, self._wake_write):
+            fcntl.fcntl(fd, fcntl.F_SETFL,
+                        fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self._selector.register(self._wake_read, selectors.EVENT_READ, None)
+
+        self._executor = None
+        self._finished = deque()
+
+        self._signal_callbacks = {}
+        self._signals = deque()
+        self._previous_signal_handlers = {}
+        self._previous_wakeup_fd = None
+
+    def add_reader(self, fd: int, callback):
+        """Call callback whenever file descriptor is readable."""
+        self._selector.register(fd, selectors.EVENT_READ, callback)
+
+    def call_repeatedly(self, interval: float, callback) -> Timer:
+        """Call callback every interval seconds."""
+        timer = Timer(time.monotonic() + interval, interval, callback)
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    def add_signal_handler(self, signum: int, callback):
+        """Call callback (from loop, not signal handler) on signal."""
+        if self._previous_wakeup_fd is None:
+            self._previous_wakeup_fd = signal.set_wakeup_fd(self._wake_write)
+        self._signal_callbacks[signum] = callback
+        self._previous_signal_handlers[signum] = \
+            signal.signal(signum, self._on_signal)
+
+    def run_in_background(self, function, callback, *args):
+        """Run function with args in a worker thread.
+
+        Callback is called from the loop with the finished future (see
+        concurrent.futures) once function returned or raised.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(EventLoop.WORKERS)
+        future = self._executor.submit(function, *args)
+        future.add_done_callback(
+            lambda done: self._on_finished(done, callback))
+        return future
+
+    def run(self):
+        """Run loop until stopped."""
+        self._running = True
+        while self._running:
+            timeout = None
+            if len(self._timers) > 0:
+                timeout = max(self._timers[0].when - time.monotonic(), 0)
+
+            try:
+                events = self._selector.select(timeout)
+            except InterruptedError:
+                events = []
+
+            for key, mask in events:
+                if key.fd == self._wake_read:
+                    self._wake_up()
+                else:
+                    key.data()
+                if not self._running:
+                    return
+
+            self._run_timers()
+
+    def stop(self):
+        """Stop loop after current callback."""
+        self._running = False
+
+    def close(self):
+        """Free loop's resources (loop must not run anymore)."""
+        for signum, handler in self._previous_signal_handlers.items():
+            signal.signal(signum, handler)
+        self._previous_signal_handlers.clear()
+        if self._previous_wakeup_fd is not None:
+            signal.set_wakeup_fd(self._previous_wakeup_fd)
+            self._previous_wakeup_fd = None
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+        self._selector.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    def _on_signal(self, signum, frame):
+        """Remember signal for loop (set_wakeup_fd() has woken it up)."""
+        self._signals.append(signum)
+
+    def _on_finished(self, future, callback):
+        """Hand finished future to loop (called from worker thread)."""
+        self._finished.append((future, callback))
+        try:
+            os.write(self._wake_write, b"\0")
+        except BlockingIOError:
+            # Pipe's full, so loop wakes up anyway
+            pass
+
+    def _wake_up(self):
+        """Call back for signals caught and tasks finished."""
+        try:
+            while os.read(self._wake_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        while len(self._signals) > 0:
+            callback = self._signal_callbacks.get(self._signals.popleft())
+            if callback:
+                callback()
+        while len(self._finished) > 0:
+            future, callback = self._finished.popleft()
+            callback(future)
+
+    def _run_timers(self):
+        """Call back for due timers."""
+        now = time.monotonic()
+        while len(self._timers) > 0 and self._timers[0].when <= now:
+            timer = heapq.heappop(self._timers)
+            timer.when = now + timer.interval
+            heapq.heappush(self._timers, timer)
+            timer.callback()
@@ -0,0 +1,82 @@
+# coding=utf-8
+
+# Shane - a poor man and/or hipster's TUI screenwriting software
+# Copyright (C) 2016 Tobias Heukäufer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+class FenwickTree(object):
+    """A Fenwick tree (binary indexed tree) of non-negative integers."""
+
+    def __init__(self, values=()):
+        """Initialize the tree with values."""
+        self._values = []
+        self._tree = []
+        self.rebuild(values)
+
+    def rebuild(self, values):
+        """Replace the tree's contents with values."""
+        self._values = list(values)
+        self._tree = [0] + self._values
+        size = len(self._tree)
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent < size:
+                self._tree[parent] += self._tree[i]
+
+    def add(self, index: int, delta: int):
+        """Add delta to value at index."""
+        self._values[index] += delta
+        index += 1
+        size = len(self._tree)
+        while index < size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, index: int) -> int:
+        """Return sum of all values before index."""
+        result = 0
+        while index > 0:
+            result += self._tree[index]
+            index -= index & -index
+        return result
+
+    def total(self) -> int:
+        """Return sum of all values."""
+        return self.prefix_sum(len(self._values))
+
+    def find(self, value: int) -> (int, int):
+        """Return index whose range contains value and offset into it."""
+        if value < 0:
+            raise ValueError("Value must not be negative!")
+
+        index = 0
+        step = 1
+        while step * 2 < len(self._tree):
+            step *= 2
+        while step > 0:
+            if index + step < len(self._tree) \
+                    and self._tree[index + step] <= value:
+                index += step
+                value -= self._tree[index]
+            step //= 2
+
+        if index >= len(self._values):
+            raise ValueError("Value exceeds total sum!")
+        return index, value
+
+    def __len__(self) -> int:
+        """Return number of values."""
+        return len(self._values)
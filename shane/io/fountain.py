@@ -16,9 +16,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import codecs
+import io
+import locale
+import mmap
 import os
-import shutil
+import re
+import stat
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 
 from shane.paragraph import Paragraph, PType
@@ -36,23 +42,31 @@ class _PrevState(Enum):
     ACTION = 6
 
 
+# Files smaller than this (in bytes) aren't worth reading in parallel
+PARALLEL_THRESHOLD = 1024 * 1024
+
+# Parts per worker a file is split into when read in parallel
+_PARTS_PER_WORKER = 4
+
+# Case insensitive "int ", "ext ", "est ", "int./ext ", "int/ext ", "i/e " (or
+# with a dot instead of the space) at line start (but only ASCII letters count,
+# as in str.lower())
+_SCENE_PATTERN = re.compile(r"(?:[iI][nN][tT](?:\.?/[eE][xX][tT])?|[eE][xX][tT]|"
+                            r"[eE][sS][tT]|[iI]/[eE])[ .]")
+
+_ALPHABETICAL_PATTERN = re.compile(r"[A-Za-z]")
+
+
 def _is_scene_conform(line: str):
     """Return if a line is scene conform (disregarding scene forcing)."""
-    return line.lower().startswith(("int ", "ext ", "est ", "int./ext ",
-                                    "int/ext ", "i/e ", "int.", "ext.", "est.",
-                                    "int./ext.", "int/ext.", "i/e."))
+    return _SCENE_PATTERN.match(line) is not None
 
 
 def _is_name_conform(line: str):
     """Return if a line is name conform (disregarding name forcing)."""
-    has_at_least_one_alphabetical = False
-    for char in line:
-        if 65 <= ord(char) <= 90 or 97 <= ord(char) <= 122:
-            has_at_least_one_alphabetical = True
-            break
-    return has_at_least_one_alphabetical and\
-        line.split("(")[0].isupper() and\
-        not line.startswith("!")
+    return not line.startswith("!") and\
+        line.partition("(")[0].isupper() and\
+        _ALPHABETICAL_PATTERN.search(line) is not None
 
 
 def _hint_scene(line: str):
@@ -71,131 +85,267 @@ def _hint_parenthetical(line: str):
 
 
 def _append_scene(plist, line):
-    """Append a scene to a paragraph list."""
+    """Append a scene to a list of paragraph types and texts."""
     if line.startswith("."):
         line = line[1:]
-    plist.append(Paragraph(PType.SCENE, line))
+    plist.append((PType.SCENE, line))
 
 
 def _append_action(plist, line):
-    """Append an action to a paragraph list."""
+    """Append an action to a list of paragraph types and texts."""
     if line.startswith("!"):
         line = line[1:]
-    plist.append(Paragraph(PType.ACTION, line))
+    plist.append((PType.ACTION, line))
 
 
 def _append_name(plist, line):
-    """Append a name to a paragraph list."""
+    """Append a name to a list of paragraph types and texts."""
     if line.startswith("@"):
         line = line[1:]
-    plist.append(Paragraph(PType.NAME, line))
+    plist.append((PType.NAME, line))
 
 
 def _append_parent(plist, line):
-    """Append parentheticals to a paragraph list."""
-    plist.append(Paragraph(PType.PARENTHETICALS, line[1:-1]))
+    """Append parentheticals to a list of paragraph types and texts."""
+    plist.append((PType.PARENTHETICALS, line[1:-1]))
 
 
 def read(path: str):
     """Read fountain script from path."""
-    result = []
+    return list(iter_read(path))
+
+
+def read_parallel(path: str, workers: int=None):
+    """Read fountain script from path, reading parts of it in parallel.
+
+    The script is split at empty lines (where reading always starts over) into
+    parts parsed by worker processes, which only hand back paragraph types and
+    texts. Scripts smaller than PARALLEL_THRESHOLD bytes (or with less than two
+    workers) are simply read by read(). As this forks, better not call it from
+    within curses.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 2 or os.path.getsize(path) < PARALLEL_THRESHOLD:
+        return read(path)
 
     with open(path, "r") as file:
-        prev_state = _PrevState.EMPTY
-        prev_line = ""
+        text = file.read()
+    parts = _split_at_empty_lines(text, workers * _PARTS_PER_WORKER)
+    if len(parts) < 2:
+        return list(_iter_read(_split_lines(text)))
+
+    result = []
+    with ProcessPoolExecutor(workers) as executor:
+        for paragraphs in executor.map(_parse_part, parts):
+            result.extend(Paragraph(ptype, text) for ptype, text in paragraphs)
+    return result
 
-        for line in file:
-            line = line.strip()
 
-            if prev_state == _PrevState.EMPTY:
-                if line:
-                    scene_hint = _hint_scene(line)
-                    name_hint = _hint_name(line)
-                    if scene_hint and name_hint:
-                        prev_state = _PrevState.SCENE_AND_NAME_HINT
-                    elif scene_hint:
-                        prev_state = _PrevState.SCENE_HINT
-                    elif name_hint:
-                        prev_state = _PrevState.NAME_HINT
-                    else:
-                        _append_action(result, line)
-                        prev_state = _PrevState.ACTION
-            elif prev_state == _PrevState.SCENE_HINT:
-                if not line:
-                    _append_scene(result, prev_line)
-                    prev_state = _PrevState.EMPTY
+def _split_at_empty_lines(text: str, count: int) -> list:
+    """Split text into about count parts ending in empty lines."""
+    parts = []
+    start = 0
+    size = len(text) // count + 1
+    while start < len(text):
+        end = text.find("\n\n", start + size)
+        if end < 0:
+            parts.append(text[start:])
+            break
+        parts.append(text[start:end + 2])
+        start = end + 2
+    return parts
+
+
+def _parse_part(text: str) -> list:
+    """Return types and texts of paragraphs of fountain script text."""
+    return list(_iter_parse(_split_lines(text)))
+
+
+def _split_lines(text: str) -> list:
+    """Return lines of text (with only newlines as line ends)."""
+    lines = text.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+def iter_read(path_or_file):
+    """Yield paragraphs of fountain script read from path or text stream.
+
+    Every paragraph is yielded as soon as it's complete (a dialog once the line
+    after it turns out not to continue it).
+    """
+    if isinstance(path_or_file, str):
+        if codecs.lookup(locale.getpreferredencoding(False)).name == "utf-8":
+            with open(path_or_file, "rb") as file:
+                yield from _iter_read(_iter_mapped_lines(file))
+        else:
+            with open(path_or_file, "r") as file:
+                yield from _iter_read(file)
+    else:
+        yield from _iter_read(path_or_file)
+
+
+def _iter_mapped_lines(file):
+    """Yield lines of UTF-8 file (opened binary) as reading it as text would.
+
+    The file is mapped to memory, decoded and split into lines in one go instead
+    of line by line. Files that can't be mapped are read as text.
+    """
+    try:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Empty or not a regular file
+        yield from io.TextIOWrapper(file, encoding="utf-8")
+        return
+
+    with data:
+        text = str(data, "utf-8")
+
+    # Same universal newlines as text files
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    yield from _split_lines(text)
+
+
+def _iter_read(lines):
+    """Yield paragraphs of fountain script read from lines of text."""
+    for ptype, text in _iter_parse(lines):
+        yield Paragraph(ptype, text)
+
+
+def _iter_parse(lines):
+    """Yield types and texts of paragraphs of fountain script lines."""
+    # Paragraph types and texts appended but not yet yielded and lines of
+    # current dialog (joined only once it's complete)
+    result = []
+    dialog = []
+
+    prev_state = _PrevState.EMPTY
+    prev_line = ""
+
+    for line in lines:
+        line = line.strip()
+
+        if prev_state == _PrevState.EMPTY:
+            if line:
+                scene_hint = _hint_scene(line)
+                name_hint = _hint_name(line)
+                if scene_hint and name_hint:
+                    prev_state = _PrevState.SCENE_AND_NAME_HINT
+                elif scene_hint:
+                    prev_state = _PrevState.SCENE_HINT
+                elif name_hint:
+                    prev_state = _PrevState.NAME_HINT
                 else:
-                    _append_action(result, prev_line)
                     _append_action(result, line)
                     prev_state = _PrevState.ACTION
-            elif prev_state == _PrevState.NAME_HINT:
-                if line:
-                    _append_name(result, prev_line)
-                    if _hint_parenthetical(line):
-                        _append_parent(result, line)
-                        prev_state = _PrevState.PARENT
-                    else:
-                        result.append(Paragraph(PType.DIALOG, line))
-                        prev_state = _PrevState.DIALOG
-                else:
-                    _append_action(result, prev_line)
-                    prev_state = _PrevState.EMPTY
-            elif prev_state == _PrevState.SCENE_AND_NAME_HINT:
-                if line:
-                    result.append(Paragraph(PType.NAME, prev_line))
-                    if _hint_parenthetical(line):
-                        _append_parent(result, line)
-                        prev_state = _PrevState.PARENT
-                    else:
-                        result.append(Paragraph(PType.DIALOG, line))
-                        prev_state = _PrevState.DIALOG
+        elif prev_state == _PrevState.SCENE_HINT:
+            if not line:
+                _append_scene(result, prev_line)
+                prev_state = _PrevState.EMPTY
+            else:
+                _append_action(result, prev_line)
+                _append_action(result, line)
+                prev_state = _PrevState.ACTION
+        elif prev_state == _PrevState.NAME_HINT:
+            if line:
+                _append_name(result, prev_line)
+                if _hint_parenthetical(line):
+                    _append_parent(result, line)
+                    prev_state = _PrevState.PARENT
                 else:
-                    _append_scene(result, prev_line)
-                    prev_state = _PrevState.EMPTY
-            elif prev_state == _PrevState.PARENT:
-                if line:
-                    result.append(Paragraph(PType.DIALOG, line))
+                    dialog = [line]
                     prev_state = _PrevState.DIALOG
+            else:
+                _append_action(result, prev_line)
+                prev_state = _PrevState.EMPTY
+        elif prev_state == _PrevState.SCENE_AND_NAME_HINT:
+            if line:
+                result.append((PType.NAME, prev_line))
+                if _hint_parenthetical(line):
+                    _append_parent(result, line)
+                    prev_state = _PrevState.PARENT
                 else:
-                    prev_state = _PrevState.EMPTY
-            elif prev_state == _PrevState.DIALOG:
-                if line:
-                    if _hint_parenthetical(line):
-                        _append_parent(result, line)
-                        prev_state = _PrevState.PARENT
-                    else:
-                        paragraph = result[-1]
-                        paragraph.sp_input(len(paragraph.get_text()) - 1,
-                                           line)
-                        prev_state = _PrevState.DIALOG
-                else:
-                    prev_state = _PrevState.EMPTY
-            elif prev_state == _PrevState.ACTION:
+                    dialog = [line]
+                    prev_state = _PrevState.DIALOG
+            else:
+                _append_scene(result, prev_line)
+                prev_state = _PrevState.EMPTY
+        elif prev_state == _PrevState.PARENT:
+            if line:
+                dialog = [line]
+                prev_state = _PrevState.DIALOG
+            else:
+                prev_state = _PrevState.EMPTY
+        elif prev_state == _PrevState.DIALOG:
+            if line and not _hint_parenthetical(line):
+                dialog.append(line)
+            else:
+                result.append((PType.DIALOG, "".join(dialog)))
                 if line:
-                    _append_action(result, line)
-                    prev_state = _PrevState.ACTION
+                    _append_parent(result, line)
+                    prev_state = _PrevState.PARENT
                 else:
                     prev_state = _PrevState.EMPTY
+        elif prev_state == _PrevState.ACTION:
+            if line:
+                _append_action(result, line)
+                prev_state = _PrevState.ACTION
+            else:
+                prev_state = _PrevState.EMPTY
 
-            prev_line = line
+        prev_line = line
 
-        if prev_state == _PrevState.SCENE_HINT:
-            _append_scene(result, prev_line)
-        elif prev_state == _PrevState.NAME_HINT:
-            _append_name(result, prev_line)
-        elif prev_state == _PrevState.SCENE_AND_NAME_HINT:
-            if '.' in prev_line:
-                result.append(Paragraph(PType.SCENE, prev_line))
-            else:
-                result.append(Paragraph(PType.NAME, prev_line))
+        if len(result) > 0:
+            yield from result
+            result.clear()
 
-    return result
+    if prev_state == _PrevState.DIALOG:
+        result.append((PType.DIALOG, "".join(dialog)))
+    elif prev_state == _PrevState.SCENE_HINT:
+        _append_scene(result, prev_line)
+    elif prev_state == _PrevState.NAME_HINT:
+        _append_name(result, prev_line)
+    elif prev_state == _PrevState.SCENE_AND_NAME_HINT:
+        if '.' in prev_line:
+            result.append((PType.SCENE, prev_line))
+        else:
+            result.append((PType.NAME, prev_line))
 
+    yield from result
 
-def write(path, paragraphs):
-    """Save fountain script to path."""
-    file, tmp_path = tempfile.mkstemp()
 
+def write(path, paragraphs):
+    """Save fountain script to path.
+
+    The script is written to a temporary file next to path which then replaces
+    path at once, so path is never left half written.
+    """
+    path = os.path.realpath(path)
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+    file, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with open(file, "w", encoding="utf-8", newline="\n") as tmp_file:
+            tmp_file.write("".join(_iter_write_lines(paragraphs)))
+            tmp_file.flush()
+            os.fchmod(tmp_file.fileno(), mode)
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _iter_write_lines(paragraphs):
+    """Yield lines (including line ends) of fountain script for paragraphs."""
     prev_empty = False
     for par in paragraphs:
         line = par.get_text()[:-1]
@@ -221,14 +371,9 @@ def write(path, paragraphs):
             line = "(" + line + ")"
 
         if not prev_empty and do_prev_empty:
-            os.write(file, "\n".encode())
-        os.write(file, (line + "\n").encode())
+            yield "\n"
+        yield line + "\n"
         if do_next_empty:
-            os.write(file, "\n".encode())
+            yield "\n"
 
         prev_empty = do_next_empty
-
-    os.close(file)
-
-    shutil.copy(tmp_path, path)
-    os.remove(tmp_path)
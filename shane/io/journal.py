@@ -0,0 +1,167 @@
+# coding=utf-8
+
+# Shane - a poor man and/or hipster's TUI screenwriting software
+# Copyright (C) 2016 Tobias Heukäufer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import tempfile
+
+_MAGIC = "shane-journal"
+_VERSION = 2
+
+
+def get_journal_path(path: str) -> str:
+    """Return path of journal belonging to file at path."""
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, "." + name + ".journal")
+
+
+def _get_base_stat(path: str):
+    """Return size and modification time of file at path (or None)."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class Journal(object):
+    """Append-only journal of records (JSON serializable lists) for a file.
+
+    The journal lives next to the file it belongs to (its base). Its first line
+    records the base's size and modification time, records are only valid for
+    exactly that base. Records are written in batches.
+    """
+
+    # Number of records to collect before writing them
+    BATCH_SIZE = 64
+
+    # Size in bytes from which on a journal should be compacted
+    COMPACT_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, path: str):
+        """Initialize journal for file at path (not creating it yet)."""
+        self._base_path = path
+        self._path = get_journal_path(path)
+        self._file = None
+        self._pending = []
+
+        # Header and number of records the journal starts over with when
+        # writing its first batch (None if appending to journal on disk)
+        self._header = [_MAGIC, _VERSION, _get_base_stat(path)]
+        self._start_count = 0
+
+    def read(self) -> list:
+        """Return journal's records (empty if missing or for another base)."""
+        try:
+            with open(self._path, "r", encoding="utf-8") as file:
+                lines = file.read().split("\n")
+        except (OSError, ValueError):
+            return []
+
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return []
+        if header != [_MAGIC, _VERSION, _get_base_stat(self._base_path)]:
+            return []
+
+        records = []
+        for line in lines[1:]:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Last line might be cut off by a crash
+                break
+        return records
+
+    def reset(self, records=(), lazy: bool=True):
+        """Start journal over with records (for new base).
+
+        If lazy, nothing is written before the first record appended afterwards.
+        """
+        self._close_file()
+        self._pending = list(records)
+        self._header = [_MAGIC, _VERSION, _get_base_stat(self._base_path)]
+        self._start_count = len(self._pending) if lazy else 0
+        if not lazy:
+            self.flush()
+
+    def append(self, record):
+        """Append record (writing it with the next batch)."""
+        self._pending.append(record)
+        if len(self._pending) >= Journal.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Write all pending records."""
+        if self._header is not None:
+            # Journal only exists on disk once something's recorded
+            if len(self._pending) > self._start_count:
+                self._write_start()
+            return
+
+        if len(self._pending) == 0:
+            return
+        if not self._file:
+            self._file = open(self._path, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(record) + "\n"
+                                 for record in self._pending))
+        self._file.flush()
+        self._pending.clear()
+
+    def _write_start(self):
+        """Replace journal on disk with header and pending records."""
+        directory = os.path.dirname(self._path)
+        file, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with open(file, "w", encoding="utf-8") as tmp_file:
+                tmp_file.write(json.dumps(self._header) + "\n")
+                for record in self._pending:
+                    tmp_file.write(json.dumps(record) + "\n")
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, self._path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+        self._pending.clear()
+        self._header = None
+
+    def needs_compaction(self) -> bool:
+        """Return if journal has grown large enough to be compacted."""
+        return self._file is not None \
+            and self._file.tell() >= Journal.COMPACT_SIZE
+
+    def close(self):
+        """Write all pending records and close journal file."""
+        self.flush()
+        self._close_file()
+
+    def _close_file(self):
+        """Close journal file (if open)."""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Remove journal (starting over without records)."""
+        self.reset()
+        try:
+            os.remove(self._path)
+        except OSError:
+            pass
@@ -18,10 +18,14 @@
 
 import curses
 import os
+import signal
 import sys
+from collections import deque
 from enum import Enum
 import locale
 
+from shane.event_loop import EventLoop
+
 from shane.screenplay import Screenplay
 from shane.sp_view import ScreenplayView, ScreenplayViewEvent
 
@@ -36,84 +40,170 @@ class ActiveWindow(Enum):
     NONE = 2
 
 
+class ViewRunner(object):
+    """Runs a screenplay's views on an event loop."""
+
+    # Seconds between writing pending journal records
+    FLUSH_INTERVAL = 2
+
+    def __init__(self, stdscr, screenplay: Screenplay, use_pad: bool):
+        """Initialize runner with views for screenplay."""
+        self._stdscr = stdscr
+        self._screenplay = screenplay
+
+        self._sp_view_width = ScreenplayView.get_required_window_width()
+        size = stdscr.getmaxyx()
+        if size[1] < self._sp_view_width or size[0] < 2:
+            raise RuntimeError("Terminal's not large enough! Must be at least " +
+                               str(self._sp_view_width) + " x 2!")
+
+        self._screenplay_view = ScreenplayView(screenplay, use_pad)
+        self._menu_view = MenuView(screenplay)
+        self._size = None
+        self._active_window = self._actual_active_window = \
+            ActiveWindow.SCREENPLAY
+
+        # Keys read but not handled yet
+        self._keys = deque()
+
+        self._loop = EventLoop()
+        self._loop.add_reader(sys.stdin.fileno(), self._on_input)
+        self._loop.add_signal_handler(signal.SIGWINCH, self._on_terminal_resize)
+        self._loop.call_repeatedly(ViewRunner.FLUSH_INTERVAL, screenplay.flush)
+
+    def run(self):
+        """Run views until user quits."""
+        self._stdscr.nodelay(True)
+        self._resize()
+        self._screenplay_view.start()
+        try:
+            self._handle_keys()
+            self._loop.run()
+        finally:
+            view = self._get_active_view()
+            if view:
+                view.stop()
+            self._loop.close()
+
+    def _get_active_view(self):
+        """Return view handling keys (or None if none does)."""
+        if self._active_window == ActiveWindow.SCREENPLAY:
+            return self._screenplay_view
+        elif self._active_window == ActiveWindow.MENU:
+            return self._menu_view
+        return None
+
+    def _activate(self, active_window: ActiveWindow):
+        """Make window's view handle keys from now on."""
+        self._get_active_view().stop()
+        self._active_window = self._actual_active_window = active_window
+        self._get_active_view().start()
+
+    def _on_input(self):
+        """Read keys and have them handled."""
+        view = self._get_active_view()
+        if view:
+            view.read_keys(self._keys)
+        else:
+            try:
+                while True:
+                    self._keys.append(self._stdscr.get_wch())
+            except curses.error:
+                pass
+        self._handle_keys()
+
+    def _handle_keys(self):
+        """Have active view handle keys read so far."""
+        while True:
+            if self._active_window == ActiveWindow.SCREENPLAY:
+                event = self._screenplay_view.handle_keys(self._keys)
+                if event == ScreenplayViewEvent.ESCAPE:
+                    self._activate(ActiveWindow.MENU)
+                elif event == ScreenplayViewEvent.RESIZE:
+                    self._resize()
+                else:
+                    return
+            elif self._active_window == ActiveWindow.MENU:
+                event = self._menu_view.handle_keys(self._keys)
+                if event == MenuViewEvent.ESCAPE:
+                    self._activate(ActiveWindow.SCREENPLAY)
+                elif event == MenuViewEvent.QUIT:
+                    self._loop.stop()
+                    return
+                elif event == MenuViewEvent.RESIZE:
+                    self._resize()
+                elif event == MenuViewEvent.REDRAW_SCREEN_VIEW:
+                    self._screenplay_view.redraw()
+                else:
+                    return
+            elif self._active_window == ActiveWindow.NONE:
+                while len(self._keys) > 0:
+                    char = self._keys.popleft()
+                    if char == "\x1b":
+                        self._loop.stop()
+                        return
+                    elif char == curses.KEY_RESIZE:
+                        self._resize()
+                        break
+                else:
+                    return
+
+    def _on_terminal_resize(self):
+        """Have curses catch up with terminal's new size."""
+        columns, lines = os.get_terminal_size(sys.stdout.fileno())
+        if curses.is_term_resized(lines, columns):
+            curses.resizeterm(lines, columns)
+        self._resize()
+        self._handle_keys()
+
+    def _resize(self):
+        """Lay out views' windows for terminal size (if changed)."""
+        size = self._stdscr.getmaxyx()
+        if size == self._size:
+            return
+        self._size = size
+
+        self._screenplay_view.remove_window()
+        self._menu_view.remove_window()
+
+        if size[1] < self._sp_view_width or size[0] < 2:
+            self._stdscr.clear()
+            self._stdscr.addstr(0, 0, "Terminal to small!")
+            self._stdscr.refresh()
+
+            if self._active_window != ActiveWindow.NONE:
+                self._get_active_view().stop()
+            self._active_window = ActiveWindow.NONE
+        else:
+            self._stdscr.clear()
+            self._stdscr.refresh()
+
+            self._screenplay_view.set_window(curses.newwin(
+                size[0] - 1, self._sp_view_width, 1,
+                int((size[1] - self._sp_view_width) / 2)))
+            self._menu_view.set_window(curses.newwin(1, size[1], 0, 0))
+
+            if self._active_window == ActiveWindow.NONE:
+                self._active_window = self._actual_active_window
+                self._get_active_view().start()
+
+
 def main(stdscr):
     """Run *Shane.*"""
-    path = sys.argv[1] if len(sys.argv) > 1 else None
-    screenplay = Screenplay(path)
-
-    size = stdscr.getmaxyx()
-
-    sp_view_width = ScreenplayView.get_required_window_width()
-    if size[1] < sp_view_width or size[0] < 2:
-        raise RuntimeError("Terminal's not large enough! Must be at least " +
-                           str(sp_view_width) + " x 2!")
-
-    screenplay_window = curses.newwin(size[0] - 1, sp_view_width, 1,
-                                      int((size[1] - sp_view_width) / 2))
-    screenplay_view = ScreenplayView(screenplay)
-    screenplay_view.set_window(screenplay_window)
-
-    menu_window = curses.newwin(1, size[1], 0, 0)
-    menu_view = MenuView(screenplay)
-    menu_view.set_window(menu_window)
-
-    active_window = actual_active_window = ActiveWindow.SCREENPLAY
-
-    while True:
-        resize = False
-
-        if active_window == ActiveWindow.SCREENPLAY:
-            event = screenplay_view.run()
-            if event == ScreenplayViewEvent.ESCAPE:
-                active_window = actual_active_window = ActiveWindow.MENU
-            elif event == ScreenplayViewEvent.RESIZE:
-                resize = True
-        elif active_window == ActiveWindow.MENU:
-            event = menu_view.run()
-            if event == MenuViewEvent.ESCAPE:
-                active_window = actual_active_window = ActiveWindow.SCREENPLAY
-            elif event == MenuViewEvent.QUIT:
-                break
-            elif event == MenuViewEvent.RESIZE:
-                resize = True
-            elif event == MenuViewEvent.REDRAW_SCREEN_VIEW:
-                screenplay_view.redraw()
-        elif active_window == ActiveWindow.NONE:
-            char = stdscr.getch()
-            if char == 27:
-                break
-            elif char == curses.KEY_RESIZE:
-                resize = True
-
-        if resize:
-            size = stdscr.getmaxyx()
-
-            if "screenplay_window" in locals():
-                screenplay_view.remove_window()
-                del screenplay_window
-            if "menu_window" in locals():
-                menu_view.remove_window()
-                del menu_window
-
-            if size[1] < sp_view_width or size[0] < 2:
-                stdscr.clear()
-                stdscr.addstr(0, 0, "Terminal to small!")
-                stdscr.refresh()
-
-                active_window = ActiveWindow.NONE
-            else:
-                stdscr.clear()
-                stdscr.refresh()
-
-                screenplay_window = curses.newwin(size[0] - 1, sp_view_width, 1,
-                                                  int((size[1] -
-                                                       sp_view_width) / 2))
-                screenplay_view.set_window(screenplay_window)
-
-                menu_window = curses.newwin(1, size[1], 0, 0)
-                menu_view.set_window(menu_window)
-
-                active_window = actual_active_window
+    args = sys.argv[1:]
+    use_pad = "--pad" in args
+    journal = "--no-journal" not in args
+    args = [arg for arg in args if arg not in ("--pad", "--no-journal")]
+
+    path = args[0] if len(args) > 0 else None
+    screenplay = Screenplay(path, journal=journal)
+    clean = False
+    try:
+        ViewRunner(stdscr, screenplay, use_pad).run()
+        clean = True
+    finally:
+        # Journal is only kept if Shane didn't quit regularly
+        screenplay.close(clean)
 
 
 def run():
@@ -24,7 +24,7 @@ from shane.view import View
 
 
 class MenuViewEvent(Enum):
-    """Enum for results from menu mainloop."""
+    """Enum for events from menu view."""
 
     ESCAPE = 0
     RESIZE = 1
@@ -38,7 +38,6 @@ class Menu(Enum):
     TOP = 0
     SAVE_AS = 1
     QUIT = 2
-    REBUILD_NAME_DB = 3
     UNDO = 4
     REDO = 5
     SAVE_ERROR = 6
@@ -48,8 +47,7 @@ class MenuView(View):
     """View for screenplay menu."""
 
     buttons = [(Menu.SAVE_AS, "Save As"), (Menu.UNDO, "Undo"),
-               (Menu.REDO, "Redo"), (Menu.REBUILD_NAME_DB, "Rebuild Name DB"),
-               (Menu.QUIT, "Quit")]
+               (Menu.REDO, "Redo"), (Menu.QUIT, "Quit")]
 
     def __init__(self, screenplay: Screenplay):
         """Initialize menu view."""
@@ -60,23 +58,24 @@ class MenuView(View):
 
         self._save_path = ""
 
-    def run(self):
-        """Run menu view's mainloop."""
-        super().run()
+    def handle_keys(self, keys):
+        """Handle keys taken from deque, then draw.
 
-        while True:
-            self._draw()
-
-            char = self._window.getch()
+        Return an event if view wants to be left, leaving keys it didn't handle
+        in deque.
+        """
+        while len(keys) > 0:
+            char = keys.popleft()
 
             escape = False
-            if char == 27:  # ESC
-                self._window.nodelay(True)
-                char = self._window.getch()
-                self._window.nodelay(False)
-                if char == -1:
+            if char == "\x1b":  # ESC
+                if len(keys) == 0:
                     escape = True
-            elif char == curses.KEY_RESIZE:
+                else:
+                    char = keys.popleft()
+            if type(char) is str:
+                char = ord(char)
+            if char == curses.KEY_RESIZE:
                 return MenuViewEvent.RESIZE
 
             if self._current_menu == Menu.TOP:
@@ -103,10 +102,6 @@ class MenuView(View):
                             Menu.REDO:
                         self._screenplay.do_redo()
                         return MenuViewEvent.REDRAW_SCREEN_VIEW
-                    elif MenuView.buttons[self._current_button][0] ==\
-                            Menu.REBUILD_NAME_DB:
-                        self._draw_processing()
-                        self._screenplay.do_rebuild_autocomplete_db()
                     elif MenuView.buttons[self._current_button][0] == Menu.QUIT:
                         return MenuViewEvent.QUIT
                 elif escape:
@@ -132,6 +127,8 @@ class MenuView(View):
                 if char == 10 or escape:
                     self._current_menu = Menu.SAVE_AS
 
+        self._draw()
+
     def _draw(self):
         """Draw menu."""
         self._window.clear()
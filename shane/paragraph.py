@@ -16,7 +16,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from bisect import bisect_right
 from enum import Enum
+from itertools import accumulate
 
 
 class PType(Enum):
@@ -146,83 +148,182 @@ class Paragraph(object):
         self._ptype = ptype
         self._text = text
         self._lines = [1]
+        self._line_ends = [1]
         self._line_count = 1 + PPrefs.get_prec_empty(self._ptype)
 
+        # Incremented with every change, cached lines are rebuilt on demand
+        self._version = 0
+        self._cached_lines = None
+
+        # Text changed but not yet reformatted: Length of unchanged start,
+        # length of unchanged end and text length before the changes
+        self._dirty_start = None
+        self._dirty_tail = 0
+        self._dirty_length = 0
+
         self._reformat()
 
-    def _reformat(self):
-        """Reformat paragraph calculating line wraps."""
+    def _reformat(self, pos: int=None, removed: int=0, inserted: int=0):
+        """Reformat paragraph calculating line wraps.
+
+        If pos is given, removed characters at pos have just been replaced by
+        inserted characters and only the lines around that change are wrapped
+        again until line wraps match the previous ones.
+        """
         width = PPrefs.get_width(self._ptype)
 
-        self._lines.clear()
+        old_lines = self._lines
+
+        # Every line starts without a pending word, so wrapping may resume at
+        # any line start. A change can only pull a word back up into the
+        # previous line, so that's where it resumes.
+        start_line = 0
+        start = 0
+        if pos is not None:
+            start_line = max(min(bisect_right(self._line_ends, pos),
+                                 len(old_lines) - 1) - 1, 0)
+            if start_line > 0:
+                start = self._line_ends[start_line - 1]
+
+        self._lines = old_lines[:start_line]
         self._lines.append(0)
+        line_start = start
+
+        delta = inserted - removed
+        old_index = start_line
+        old_start = start
 
         current_word_len = 0
 
-        for char in self._text:
+        for char in self._text[start:]:
             current_word_len += 1
 
             # TODO work with hyphen
             if char == ' ' or char == '\0':
                 self._lines[-1] += current_word_len
                 current_word_len = 0
+                continue
             elif current_word_len == width:
                 self._lines[-1] += current_word_len
+                line_start += self._lines[-1]
                 self._lines.append(0)
                 current_word_len = 0
             elif self._lines[-1] + current_word_len > width:
+                line_start += self._lines[-1]
                 self._lines.append(0)
-
+            else:
+                continue
+
+            # A new line started: If an old line started at the same place
+            # behind the change all following wraps are the same as before
+            if pos is not None:
+                while old_index < len(old_lines) \
+                        and old_start + delta < line_start:
+                    old_start += old_lines[old_index]
+                    old_index += 1
+                if old_index < len(old_lines) \
+                        and old_start + delta == line_start \
+                        and old_start >= pos + removed:
+                    self._lines[-1:] = old_lines[old_index:]
+                    break
+
+        self._line_ends = list(accumulate(self._lines))
         self._line_count = len(self._lines) + PPrefs.get_prec_empty(self._ptype)
 
-    def sp_input(self, pos: int, text: str):
-        """Input text into paragraph."""
+    def _invalidate(self):
+        """Mark paragraph as changed."""
+        self._version += 1
+        self._cached_lines = None
+
+    def _mark_dirty(self, pos: int, removed: int, inserted: int):
+        """Remember that removed characters at pos were replaced."""
+        length = len(self._text)
+        if self._dirty_start is None:
+            self._dirty_start = pos
+            self._dirty_tail = length - pos - inserted
+            self._dirty_length = length - inserted + removed
+        else:
+            self._dirty_start = min(self._dirty_start, pos)
+            self._dirty_tail = min(self._dirty_tail, length - pos - inserted)
+
+    def sp_input(self, pos: int, text: str, reformat: bool=True):
+        """Input text into paragraph.
+
+        Without reformat line wraps are outdated until sp_reformat() is called.
+        """
         self._text = self._text[:pos] + text + self._text[pos:]
-        self._reformat()
+        self._mark_dirty(pos, 0, len(text))
+        if reformat:
+            self.sp_reformat()
+        else:
+            self._invalidate()
+
+    def sp_delete(self, pos: int, length: int, reformat: bool=True) -> str:
+        """Delete text from paragraph and return deleted text.
 
-    def sp_delete(self, pos: int, length: int) -> str:
-        """Delete text from paragraph and return deleted text."""
+        Without reformat line wraps are outdated until sp_reformat() is called.
+        """
         deleted = self._text[pos:pos + length]
         self._text = self._text[:pos] + self._text[pos + length:]
-        self._reformat()
+        self._mark_dirty(pos, len(deleted), 0)
+        if reformat:
+            self.sp_reformat()
+        else:
+            self._invalidate()
         return deleted
 
+    def sp_reformat(self):
+        """Reformat lines around all changes made since last reformat."""
+        if self._dirty_start is not None:
+            start = self._dirty_start
+            self._reformat(start, self._dirty_length - self._dirty_tail - start,
+                           len(self._text) - self._dirty_tail - start)
+            self._dirty_start = None
+            # Lines read since the change are outdated now
+            self._invalidate()
+
     def sp_set_type(self, ptype: PType):
         """Set paragraph's type."""
         self._ptype = ptype
         self._reformat()
+        self._dirty_start = None
+        self._invalidate()
 
     def get_text(self) -> str:
         """Return paragraph's text (ending with null character)."""
         return self._text
 
+    def get_text_length(self) -> int:
+        """Return length of paragraph's text (including null character)."""
+        return len(self._text)
+
     def get_line_count(self) -> int:
         """Return number of lines."""
         return self._line_count
 
-    def get_lines(self) -> list():
+    def get_lines(self) -> tuple:
         """Return text in line wrapped form."""
-        result = []
+        if self._cached_lines is None:
+            result = [""] * PPrefs.get_prec_empty(self._ptype)
 
-        for i in range(PPrefs.get_prec_empty(self._ptype)):
-            result.append("")
+            line_start = 0
+            for line_len in self._lines:
+                result.append(self._text[line_start:line_start + line_len])
+                line_start += line_len
 
-        line_start = 0
-        for line_len in self._lines:
-            result.append(self._text[line_start: line_start + line_len])
-            line_start += line_len
+            self._cached_lines = tuple(result)
 
-        return result
+        return self._cached_lines
+
+    def get_version(self) -> int:
+        """Return version number (changing with every paragraph change)."""
+        return self._version
 
     def get_line_column_at_pos(self, pos: int) -> (int, int):
         """Return line and column for position."""
-        line = 0
-        for i in range(0, len(self._lines)):
-            if pos - self._lines[i] >= 0:
-                pos -= self._lines[i]
-                line += 1
-            else:
-                break
+        line = bisect_right(self._line_ends, pos)
+        if line > 0:
+            pos -= self._line_ends[line - 1]
 
         return line + PPrefs.get_prec_empty(self._ptype), pos
 
@@ -240,8 +341,8 @@ class Paragraph(object):
         if column >= self._lines[line]:
             column = self._lines[line] - 1
 
-        for i in range(line):
-            column += self._lines[i]
+        if line > 0:
+            column += self._line_ends[line - 1]
 
         return column
 
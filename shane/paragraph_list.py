@@ -0,0 +1,297 @@
+# coding=utf-8
+
+# Shane - a poor man and/or hipster's TUI screenwriting software
+# Copyright (C) 2016 Tobias Heukäufer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from bisect import bisect_right
+from itertools import accumulate
+
+from shane.fenwick import FenwickTree
+from shane.paragraph import Paragraph, PType
+
+
+class _Block(object):
+    """A block of paragraphs with their line counts and scene flags."""
+
+    __slots__ = ("paragraphs", "line_counts", "scene_flags")
+
+    def __init__(self, paragraphs):
+        """Initialize block with paragraphs."""
+        self.paragraphs = list(paragraphs)
+        self.line_counts = [p.get_line_count() for p in self.paragraphs]
+        self.scene_flags = [p.get_type() == PType.SCENE
+                            for p in self.paragraphs]
+
+    def get_scene_count(self) -> int:
+        """Return number of scene headings in block."""
+        return sum(self.scene_flags)
+
+    def __len__(self) -> int:
+        """Return number of paragraphs in block."""
+        return len(self.paragraphs)
+
+
+class ParagraphList(object):
+    """A list of paragraphs stored in blocks.
+
+    Fenwick trees over the blocks' paragraph counts, line counts and scene
+    counts find paragraphs by index, line or scene in logarithmic time. Blocks
+    are split when growing too large and removed when running empty.
+    """
+
+    BLOCK_SIZE = 128
+
+    def __init__(self, paragraphs=()):
+        """Initialize list with paragraphs."""
+        self._blocks = []
+        self._counts = FenwickTree()
+        self._lines = FenwickTree()
+        self._scenes = FenwickTree()
+
+        self._blocks = ParagraphList._make_blocks(list(paragraphs))
+        self._rebuild()
+
+    @staticmethod
+    def _make_blocks(paragraphs: list) -> list:
+        """Return blocks holding paragraphs."""
+        return [_Block(paragraphs[i:i + ParagraphList.BLOCK_SIZE])
+                for i in range(0, len(paragraphs), ParagraphList.BLOCK_SIZE)]
+
+    def _rebuild(self):
+        """Rebuild block indices."""
+        self._counts.rebuild(len(block) for block in self._blocks)
+        self._lines.rebuild(sum(block.line_counts) for block in self._blocks)
+        self._scenes.rebuild(block.get_scene_count() for block in self._blocks)
+
+    def _locate(self, index: int) -> (int, int):
+        """Return block index and offset into block for paragraph index."""
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("Paragraph index out of range!")
+        return self._counts.find(index)
+
+    def insert(self, index: int, paragraph: Paragraph):
+        """Insert paragraph at index."""
+        if index < 0:
+            index = max(index + len(self), 0)
+        if len(self._blocks) == 0:
+            self._blocks.append(_Block([paragraph]))
+            self._rebuild()
+            return
+
+        if index >= len(self):
+            block_index = len(self._blocks) - 1
+            offset = len(self._blocks[block_index])
+        else:
+            block_index, offset = self._counts.find(index)
+
+        block = self._blocks[block_index]
+        block.paragraphs.insert(offset, paragraph)
+        block.line_counts.insert(offset, paragraph.get_line_count())
+        block.scene_flags.insert(offset, paragraph.get_type() == PType.SCENE)
+
+        if len(block) > 2 * ParagraphList.BLOCK_SIZE:
+            half = len(block) // 2
+            self._blocks[block_index:block_index + 1] = [
+                _Block(block.paragraphs[:half]),
+                _Block(block.paragraphs[half:])]
+            self._rebuild()
+        else:
+            self._counts.add(block_index, 1)
+            self._lines.add(block_index, block.line_counts[offset])
+            self._scenes.add(block_index, int(block.scene_flags[offset]))
+
+    def insert_range(self, index: int, paragraphs):
+        """Insert paragraphs at index (in one go)."""
+        new_block = _Block(paragraphs)
+        if len(new_block) == 0:
+            return
+        if index < 0:
+            index = max(index + len(self), 0)
+        if len(self._blocks) == 0:
+            self._blocks = ParagraphList._make_blocks(new_block.paragraphs)
+            self._rebuild()
+            return
+
+        if index >= len(self):
+            block_index = len(self._blocks) - 1
+            offset = len(self._blocks[block_index])
+        else:
+            block_index, offset = self._counts.find(index)
+
+        block = self._blocks[block_index]
+        block.paragraphs[offset:offset] = new_block.paragraphs
+        block.line_counts[offset:offset] = new_block.line_counts
+        block.scene_flags[offset:offset] = new_block.scene_flags
+
+        if len(block) > 2 * ParagraphList.BLOCK_SIZE:
+            self._blocks[block_index:block_index + 1] = \
+                ParagraphList._make_blocks(block.paragraphs)
+            self._rebuild()
+        else:
+            self._counts.add(block_index, len(new_block))
+            self._lines.add(block_index, sum(new_block.line_counts))
+            self._scenes.add(block_index, new_block.get_scene_count())
+
+    def delete_range(self, start: int, end: int) -> list:
+        """Remove paragraphs from start to end and return them."""
+        if start < 0 or end > len(self) or start > end:
+            raise IndexError("Paragraph range out of range!")
+        if start == end:
+            return []
+
+        removed = []
+        changes = []
+        block_index, offset = self._counts.find(start)
+        count = end - start
+        while count > 0:
+            block = self._blocks[block_index]
+            stop = min(offset + count, len(block))
+            removed.extend(block.paragraphs[offset:stop])
+            changes.append((block_index, stop - offset,
+                            sum(block.line_counts[offset:stop]),
+                            sum(block.scene_flags[offset:stop])))
+            del block.paragraphs[offset:stop]
+            del block.line_counts[offset:stop]
+            del block.scene_flags[offset:stop]
+            count -= stop - offset
+            block_index += 1
+            offset = 0
+
+        # Blocks running empty are only removed by a rebuild
+        if any(len(self._blocks[change[0]]) == 0 for change in changes):
+            self._blocks = [block for block in self._blocks if len(block) > 0]
+            self._rebuild()
+        else:
+            for block_index, paragraphs, lines, scenes in changes:
+                self._counts.add(block_index, -paragraphs)
+                self._lines.add(block_index, -lines)
+                self._scenes.add(block_index, -scenes)
+
+        return removed
+
+    def move_range(self, start: int, end: int, dest: int) -> list:
+        """Move paragraphs from start to end to dest (index after removal).
+
+        Returns moved paragraphs.
+        """
+        paragraphs = self.delete_range(start, end)
+        self.insert_range(dest, paragraphs)
+        return paragraphs
+
+    def pop(self, index: int) -> Paragraph:
+        """Remove paragraph at index and return it."""
+        block_index, offset = self._locate(index)
+
+        block = self._blocks[block_index]
+        paragraph = block.paragraphs.pop(offset)
+        line_count = block.line_counts.pop(offset)
+        scene_flag = block.scene_flags.pop(offset)
+
+        if len(block) == 0:
+            self._blocks.pop(block_index)
+            self._rebuild()
+        else:
+            self._counts.add(block_index, -1)
+            self._lines.add(block_index, -line_count)
+            self._scenes.add(block_index, -int(scene_flag))
+
+        return paragraph
+
+    def refresh(self, index: int):
+        """Update indices after paragraph at index changed."""
+        block_index, offset = self._locate(index)
+
+        block = self._blocks[block_index]
+        paragraph = block.paragraphs[offset]
+
+        line_count = paragraph.get_line_count()
+        self._lines.add(block_index, line_count - block.line_counts[offset])
+        block.line_counts[offset] = line_count
+
+        scene_flag = paragraph.get_type() == PType.SCENE
+        self._scenes.add(block_index,
+                         int(scene_flag) - int(block.scene_flags[offset]))
+        block.scene_flags[offset] = scene_flag
+
+    def get_line_count(self) -> int:
+        """Return number of lines of all paragraphs."""
+        return self._lines.total()
+
+    def get_line_offset(self, index: int) -> int:
+        """Return number of lines before paragraph at index."""
+        block_index, offset = self._locate(index)
+        return self._lines.prefix_sum(block_index) + \
+            sum(self._blocks[block_index].line_counts[:offset])
+
+    def find_line(self, line: int) -> (int, int):
+        """Return paragraph index for line and offset into said paragraph."""
+        if line < 0 or line >= self._lines.total():
+            raise ValueError("Not enough lines in screenplay!")
+        block_index, line = self._lines.find(line)
+        ends = list(accumulate(self._blocks[block_index].line_counts))
+        offset = bisect_right(ends, line)
+        if offset > 0:
+            line -= ends[offset - 1]
+        return self._counts.prefix_sum(block_index) + offset, line
+
+    def get_scene_count(self) -> int:
+        """Return number of scene headings."""
+        return self._scenes.total()
+
+    def count_scenes_before(self, index: int) -> int:
+        """Return number of scene headings before index."""
+        if index >= len(self):
+            return self._scenes.total()
+        block_index, offset = self._locate(index)
+        return self._scenes.prefix_sum(block_index) + \
+            sum(self._blocks[block_index].scene_flags[:offset])
+
+    def find_scene(self, scene: int) -> int:
+        """Return paragraph index of scene heading by its number."""
+        if scene < 0 or scene >= self._scenes.total():
+            raise ValueError("Not enough scenes in screenplay!")
+        block_index, scene = self._scenes.find(scene)
+        flags = self._blocks[block_index].scene_flags
+        for offset in range(len(flags)):
+            if flags[offset]:
+                if scene == 0:
+                    return self._counts.prefix_sum(block_index) + offset
+                scene -= 1
+
+    def iter_scenes(self):
+        """Iterate over paragraph indices of scene headings."""
+        index = 0
+        for block in self._blocks:
+            for offset in range(len(block)):
+                if block.scene_flags[offset]:
+                    yield index + offset
+            index += len(block)
+
+    def __getitem__(self, index: int) -> Paragraph:
+        """Return paragraph at index."""
+        block_index, offset = self._locate(index)
+        return self._blocks[block_index].paragraphs[offset]
+
+    def __iter__(self):
+        """Iterate over paragraphs."""
+        for block in self._blocks:
+            yield from block.paragraphs
+
+    def __len__(self) -> int:
+        """Return number of paragraphs."""
+        return self._counts.total()
@@ -16,10 +16,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import sys
 import time
+from bisect import bisect_left
+from collections import deque
 
 from shane.io import fountain
+from shane.io.journal import Journal
 from shane.paragraph import Paragraph, PType, PPrefs
+from shane.paragraph_list import ParagraphList
 
 
 class NameDB(object):
@@ -27,212 +32,722 @@ class NameDB(object):
 
     def __init__(self):
         """Initialize the name database."""
-        self._a_m = []
-        self._n_z = []
-        self._else = []
+        # Sorted list of names and how often each name is used
+        self._names = []
+        self._counts = {}
 
     def clear(self):
         """Clear the database's contents."""
-        self._a_m.clear()
-        self._n_z.clear()
-        self._else.clear()
+        self._names.clear()
+        self._counts.clear()
 
     def add(self, name: str):
-        """Add a name to the database."""
+        """Add a name (or another use of it) to the database."""
         if not name:
             return
 
-        first_char = ord(name[0].lower())
-        list_to_add_to = self._else
-        if 97 <= first_char <= 109:
-            list_to_add_to = self._a_m
-        elif 110 <= first_char <= 122:
-            list_to_add_to = self._n_z
-
-        for i in range(len(list_to_add_to)):
-            if name == list_to_add_to[i]:
-                break
-            elif name < list_to_add_to[i]:
-                list_to_add_to.insert(i, name)
+        count = self._counts.get(name, 0)
+        self._counts[name] = count + 1
+        if count == 0:
+            self._names.insert(bisect_left(self._names, name), name)
+
+    def remove(self, name: str):
+        """Remove a use of a name from the database."""
+        count = self._counts.get(name, 0)
+        if count > 1:
+            self._counts[name] = count - 1
+        elif count == 1:
+            del self._counts[name]
+            self._names.pop(bisect_left(self._names, name))
+
+    def iter_starting_with(self, starting_with: str):
+        """Iterate over names (in order) starting with a name's beginning."""
+        for i in range(bisect_left(self._names, starting_with),
+                       len(self._names)):
+            if not self._names[i].startswith(starting_with):
                 break
-        else:
-            list_to_add_to.append(name)
+            yield self._names[i]
 
     def get_next(self, name: str, starting_with: str) -> str:
         """Get a name from the database based on a name's beginning."""
         if not starting_with:
             return name
 
-        first_char = ord(starting_with[0].lower())
-        list_to_go_from = self._else
-        if 97 <= first_char <= 109:
-            list_to_go_from = self._a_m
-        elif 110 <= first_char <= 122:
-            list_to_go_from = self._n_z
+        first = bisect_left(self._names, starting_with)
+        if first == len(self._names) or \
+                not self._names[first].startswith(starting_with):
+            return name
 
-        proposals = [n for n in list_to_go_from if n.startswith(starting_with)]
-        try:
-            index = proposals.index(name)
-            if index < len(proposals) - 1:
-                return proposals[index + 1]
-            else:
-                return proposals[0]
-        except ValueError:
-            if len(proposals) > 0:
-                return proposals[0]
-            else:
-                return name
+        # Cycle to the name following the given one
+        if name.startswith(starting_with):
+            index = bisect_left(self._names, name, first)
+            if index < len(self._names) and self._names[index] == name:
+                if index + 1 < len(self._names) and \
+                        self._names[index + 1].startswith(starting_with):
+                    return self._names[index + 1]
+        return self._names[first]
+
+
+class ParagraphChange(object):
+    """A change of paragraphs published to a screenplay's subscribers.
+
+    From pindex on, old_count paragraphs spanning old_lines lines have been
+    replaced by new_count paragraphs spanning new_lines lines. A text edit
+    replaces one paragraph by itself, type_changed is set if its type changed.
+    """
+
+    __slots__ = ("pindex", "old_count", "new_count", "old_lines", "new_lines",
+                 "type_changed")
+
+    def __init__(self, pindex: int, old_count: int, new_count: int,
+                 old_lines: int, new_lines: int, type_changed: bool=False):
+        """Initialize change."""
+        self.pindex = pindex
+        self.old_count = old_count
+        self.new_count = new_count
+        self.old_lines = old_lines
+        self.new_lines = new_lines
+        self.type_changed = type_changed
 
 
 class ActionBundle(object):
     """A bundle of actions remembering when last action was inserted."""
 
+    __slots__ = ("actions", "last_action", "size")
+
     # 200ms
     TIME_DISTANCE = 0.2
 
     def __init__(self, action):
         """Initialize the bundle with a new action."""
+        # Last action is newest action
         self.actions = [action]
         self.last_action = time.time()
+        self.size = sys.getsizeof(self) + action.get_size()
 
     def is_relatively_new(self):
         """Return if not much time has passed since last action addition."""
         return time.time() - self.last_action < ActionBundle.TIME_DISTANCE
 
     def add_action(self, action):
-        """Add new action."""
-        self.actions.insert(0, action)
+        """Add new action (merging it into newest action if possible)."""
+        newest = self.actions[-1]
+        newest_size = newest.get_size()
+        if newest.merge(action):
+            self.size += newest.get_size() - newest_size
+        else:
+            self.actions.append(action)
+            self.size += action.get_size()
         self.last_action = time.time()
 
 
 class InputAction(object):
     """Action for text input."""
+
+    __slots__ = ("pindex", "position", "text")
+
     def __init__(self, pindex: int, position: int, text: str):
         """Initialize action."""
         self.pindex = pindex
         self.position = position
         self.text = text
 
+    def merge(self, action) -> bool:
+        """Merge input right behind this one's text, return if merged."""
+        if type(action) is InputAction and action.pindex == self.pindex \
+                and action.position == self.position + len(self.text):
+            self.text += action.text
+            return True
+        return False
+
+    def get_size(self) -> int:
+        """Return approximate size in memory."""
+        return sys.getsizeof(self) + sys.getsizeof(self.text)
+
+    def to_record(self) -> list:
+        """Return action as journal record."""
+        return ["i", self.pindex, self.position, self.text]
+
 
 class DeleteAction(object):
     """Action for text deletion."""
-    def __init__(self, pindex: int, position: int, text: str):
-        """Initialize action."""
+
+    __slots__ = ("pindex", "position", "text", "cursor_pos")
+
+    def __init__(self, pindex: int, position: int, text: str,
+                 cursor_pos: int=None):
+        """Initialize action (cursor position after undo defaults to end)."""
         self.pindex = pindex
         self.position = position
         self.text = text
+        # Cursor stays behind the text deleted first even if more is merged in
+        self.cursor_pos = position + len(text) if cursor_pos is None \
+            else cursor_pos
+
+    def merge(self, action) -> bool:
+        """Merge deletion right before or at this one, return if merged."""
+        if type(action) is not DeleteAction or action.pindex != self.pindex:
+            return False
+        if action.position == self.position:  # Deleting forward
+            self.text += action.text
+            return True
+        elif action.position + len(action.text) == self.position:  # Backward
+            self.position = action.position
+            self.text = action.text + self.text
+            return True
+        return False
+
+    def get_size(self) -> int:
+        """Return approximate size in memory."""
+        return sys.getsizeof(self) + sys.getsizeof(self.text)
+
+    def to_record(self) -> list:
+        """Return action as journal record."""
+        return ["d", self.pindex, self.position, self.text, self.cursor_pos]
 
 
 class NewParagraphAction(object):
     """Action for paragraph creation."""
+
+    __slots__ = ("pindex", "ptype", "text")
+
     def __init__(self, pindex: int, ptype: PType, text: str):
         """Initialize action."""
         self.pindex = pindex
         self.ptype = ptype
         self.text = text
 
+    def merge(self, action) -> bool:
+        """Return False as paragraph creations don't merge."""
+        return False
+
+    def get_size(self) -> int:
+        """Return approximate size in memory."""
+        return sys.getsizeof(self) + sys.getsizeof(self.text)
+
+    def to_record(self) -> list:
+        """Return action as journal record."""
+        return ["n", self.pindex, self.ptype.value, self.text]
+
 
 class DeleteParagraphAction(object):
     """Action for paragraph deletion."""
+
+    __slots__ = ("pindex", "ptype", "text")
+
     def __init__(self, pindex: int, ptype: PType, text: str):
         """Initialize action."""
         self.pindex = pindex
         self.ptype = ptype
         self.text = text
 
+    def merge(self, action) -> bool:
+        """Return False as paragraph deletions don't merge."""
+        return False
+
+    def get_size(self) -> int:
+        """Return approximate size in memory."""
+        return sys.getsizeof(self) + sys.getsizeof(self.text)
+
+    def to_record(self) -> list:
+        """Return action as journal record."""
+        return ["x", self.pindex, self.ptype.value, self.text]
+
+
+class NewParagraphsAction(object):
+    """Action for creation of multiple paragraphs at once."""
+
+    __slots__ = ("pindex", "paragraphs")
+
+    def __init__(self, pindex: int, paragraphs: list):
+        """Initialize action with list of paragraph types and texts."""
+        self.pindex = pindex
+        self.paragraphs = paragraphs
+
+    def merge(self, action) -> bool:
+        """Return False as paragraph creations don't merge."""
+        return False
+
+    def get_size(self) -> int:
+        """Return approximate size in memory."""
+        return sys.getsizeof(self) + sys.getsizeof(self.paragraphs) + \
+            sum(sys.getsizeof(text) for ptype, text in self.paragraphs)
+
+    def to_record(self) -> list:
+        """Return action as journal record."""
+        return ["N", self.pindex, [[ptype.value, text]
+                                   for ptype, text in self.paragraphs]]
+
+
+class DeleteParagraphsAction(object):
+    """Action for deletion of multiple paragraphs at once."""
+
+    __slots__ = ("pindex", "paragraphs")
+
+    def __init__(self, pindex: int, paragraphs: list):
+        """Initialize action with list of paragraph types and texts."""
+        self.pindex = pindex
+        self.paragraphs = paragraphs
+
+    def merge(self, action) -> bool:
+        """Return False as paragraph deletions don't merge."""
+        return False
+
+    def get_size(self) -> int:
+        """Return approximate size in memory."""
+        return sys.getsizeof(self) + sys.getsizeof(self.paragraphs) + \
+            sum(sys.getsizeof(text) for ptype, text in self.paragraphs)
+
+    def to_record(self) -> list:
+        """Return action as journal record."""
+        return ["X", self.pindex, [[ptype.value, text]
+                                   for ptype, text in self.paragraphs]]
+
+
+class MoveParagraphsAction(object):
+    """Action for moving paragraphs."""
+
+    __slots__ = ("pindex", "count", "dest")
+
+    def __init__(self, pindex: int, count: int, dest: int):
+        """Initialize action."""
+        self.pindex = pindex
+        self.count = count
+        self.dest = dest
+
+    def merge(self, action) -> bool:
+        """Return False as paragraph moves don't merge."""
+        return False
+
+    def get_size(self) -> int:
+        """Return approximate size in memory."""
+        return sys.getsizeof(self)
+
+    def to_record(self) -> list:
+        """Return action as journal record."""
+        return ["m", self.pindex, self.count, self.dest]
+
 
 class ChangePTypeAction(object):
     """Action for paragraph type change."""
+
+    __slots__ = ("pindex", "prev_type", "new_type")
+
     def __init__(self, pindex: int, prev_type: PType, new_type: PType):
         """Initialize action."""
         self.pindex = pindex
         self.prev_type = prev_type
         self.new_type = new_type
 
+    def merge(self, action) -> bool:
+        """Return False as type changes don't merge."""
+        return False
+
+    def get_size(self) -> int:
+        """Return approximate size in memory."""
+        return sys.getsizeof(self)
+
+    def to_record(self) -> list:
+        """Return action as journal record."""
+        return ["t", self.pindex, self.prev_type.value, self.new_type.value]
+
+
+def _action_from_record(record: list):
+    """Return action from journal record."""
+    kind = record[0]
+    if kind == "i":
+        return InputAction(record[1], record[2], record[3])
+    elif kind == "d":
+        return DeleteAction(record[1], record[2], record[3], record[4])
+    elif kind == "n":
+        return NewParagraphAction(record[1], PType(record[2]), record[3])
+    elif kind == "x":
+        return DeleteParagraphAction(record[1], PType(record[2]), record[3])
+    elif kind == "N":
+        return NewParagraphsAction(record[1], [(PType(ptype), text)
+                                               for ptype, text in record[2]])
+    elif kind == "X":
+        return DeleteParagraphsAction(record[1], [(PType(ptype), text)
+                                                  for ptype, text in record[2]])
+    elif kind == "m":
+        return MoveParagraphsAction(record[1], record[2], record[3])
+    elif kind == "t":
+        return ChangePTypeAction(record[1], PType(record[2]), PType(record[3]))
+    raise ValueError("Unknown action record!")
+
 
 class Screenplay(object):
     """A screenplay."""
 
-    # Why 20? Dunno.
-    MAX_ACTION_SIZE = 20
+    # Default memory for undo history (in bytes)
+    UNDO_BUDGET = 1024 * 1024
 
-    def __init__(self, path: str=None):
-        """Initialize the screenplay."""
-        self._paragraphs = []
+    def __init__(self, path: str=None, undo_budget: int=None,
+                 journal: bool=False):
+        """Initialize the screenplay.
 
+        With journal set every action is written to a journal next to the
+        screenplay's file, which is replayed when opening the file again.
+        """
         self._path = path
+
+        self._name_db = NameDB()
+
+        # Callables called with every paragraph change
+        self._subscribers = []
+        self._paragraphs = ParagraphList()
+
+        self._undo_budget = undo_budget if undo_budget is not None \
+            else Screenplay.UNDO_BUDGET
+
+        self._journaling = journal
+        self._journal = None
+        # If next action starts a new bundle (None for bundling by time)
+        self._new_bundle = None
+
+        # Internal clipboard as list of paragraph types and texts
+        self._clipboard = []
+
+        self._load(self._read_paragraphs())
+
+        if self._journaling and self._path:
+            self._open_journal()
+
+    def _read_paragraphs(self) -> list:
+        """Return paragraphs read from screenplay's path."""
+        paragraphs = []
         if self._path:
             try:
-                self._paragraphs.extend(fountain.read(path))
+                paragraphs.extend(fountain.read(self._path))
             except OSError:
                 pass
-        if not path or len(self._paragraphs) == 0:
-            self._paragraphs.append(Paragraph(PType.SCENE))
+        if len(paragraphs) == 0:
+            paragraphs.append(Paragraph(PType.SCENE))
+        return paragraphs
+
+    def _load(self, paragraphs: list):
+        """Replace screenplay's paragraphs, forgetting cursor and actions."""
+        old_count = len(self._paragraphs)
+        old_lines = self._paragraphs.get_line_count()
+        self._paragraphs = ParagraphList(paragraphs)
+        self._publish(ParagraphChange(0, old_count, len(self._paragraphs),
+                                      old_lines,
+                                      self._paragraphs.get_line_count()))
 
         self._cursor_par = 0
         self._cursor_pos = 0
 
-        self._name_db = NameDB()
+        # Selection's anchor as paragraph index and position (or None)
+        self._selection = None
+
+        # Paragraphs by index whose reformatting is deferred (if not None)
+        self._deferred = None
+
         self.do_rebuild_autocomplete_db()
 
         # First action is newest action
-        self._previous_actions = []
+        self._previous_actions = deque()
         self._current_action = 0
+        self._undo_size = 0
+
+    def _open_journal(self):
+        """Open journal for screenplay's path, replaying what it recorded.
+
+        A journal is only left behind if Shane didn't close the screenplay (e.g.
+        it crashed), so replaying it restores what would have been lost.
+        """
+        journal = Journal(self._path)
+        records = journal.read()
+        if len(records) > 0:
+            try:
+                self._replay_journal(records)
+            except (ValueError, LookupError, TypeError):
+                self._load(self._read_paragraphs())
+                records = []
+        self._journal = journal
+
+        if len(records) > 0:
+            # Restored state is the new start (replacing the old journal with
+            # the next batch)
+            self._reset_journal()
+        else:
+            # Journal for another base (or broken), if any
+            journal.remove()
+
+    def _replay_journal(self, records: list):
+        """Replay records read from journal."""
+        for record in records:
+            kind = record[0]
+            if kind == "a":
+                self._new_bundle = bool(record[1])
+                try:
+                    self._apply_action(_action_from_record(record[2]))
+                finally:
+                    self._new_bundle = None
+            elif kind == "u":
+                self.do_undo()
+            elif kind == "r":
+                self.do_redo()
+            elif kind == "s":
+                self._load([Paragraph(PType(ptype), text)
+                            for ptype, text in record[1]])
+            elif kind == "h":
+                self._previous_actions.clear()
+                self._undo_size = 0
+                for actions in record[1]:
+                    actions = [_action_from_record(a) for a in actions]
+                    bundle = ActionBundle(actions[0])
+                    for action in actions[1:]:
+                        bundle.actions.append(action)
+                        bundle.size += action.get_size()
+                    bundle.last_action = 0
+                    self._previous_actions.append(bundle)
+                    self._undo_size += bundle.size
+                self._current_action = record[2]
+            else:
+                raise ValueError("Unknown journal record!")
+
+        self._cursor_par = min(self._cursor_par, len(self._paragraphs) - 1)
+        self._cursor_pos = min(self._cursor_pos, self._paragraphs[
+            self._cursor_par].get_text_length() - 1)
 
     # HERE COME THE ONLY METHODS ALLOWED TO USE PARAGRAPH'S SP_-METHODS OR
     # CHANGE SELF._PARAGRAPHS
 
     def _input(self, pindex: int, position: int, text: str, undo: bool=True):
         """Input text into a paragraph."""
-        self._paragraphs[pindex].sp_input(position, text)
+        self._update_name_db(pindex, False)
+        if self._deferred is None:
+            old_lines = self._paragraphs[pindex].get_line_count()
+            self._paragraphs[pindex].sp_input(position, text)
+            self._paragraphs.refresh(pindex)
+            self._publish_edit(pindex, old_lines)
+        else:
+            self._paragraphs[pindex].sp_input(position, text, False)
+            self._deferred[pindex] = self._paragraphs[pindex]
+        self._update_name_db(pindex, True)
         if undo:
             self._add_action(InputAction(pindex, position, text))
 
     def _delete(self, pindex: int, position: int, length: int, undo: bool=True) -> str:
         """Delete text from a pragraph and return deleted text."""
-        deleted = self._paragraphs[pindex].sp_delete(position, length)
+        self._update_name_db(pindex, False)
+        if self._deferred is None:
+            old_lines = self._paragraphs[pindex].get_line_count()
+            deleted = self._paragraphs[pindex].sp_delete(position, length)
+            self._paragraphs.refresh(pindex)
+            self._publish_edit(pindex, old_lines)
+        else:
+            deleted = self._paragraphs[pindex].sp_delete(position, length,
+                                                         False)
+            self._deferred[pindex] = self._paragraphs[pindex]
+        self._update_name_db(pindex, True)
         if undo:
             self._add_action(DeleteAction(pindex, position, deleted))
         return deleted
 
     def _new_paragraph(self, pindex: int, ptype: PType, text: str=None, undo: bool=True):
         """Add a new paragraph at index."""
-        self._paragraphs.insert(pindex, Paragraph(ptype, text))
+        self._reformat_deferred()
+        paragraph = Paragraph(ptype, text)
+        self._paragraphs.insert(pindex, paragraph)
+        self._update_name_db(pindex, True)
+        self._publish(ParagraphChange(pindex, 0, 1, 0,
+                                      paragraph.get_line_count()))
         if undo:
             self._add_action(NewParagraphAction(pindex, ptype, text))
 
     def _delete_paragraph(self, pindex: int, undo: bool=True):
         """Delete paragraph at index."""
+        self._reformat_deferred()
         text = self._paragraphs[pindex].get_text()[:-1]
         ptype = self._paragraphs[pindex].get_type()
-        self._paragraphs.pop(pindex)
+        self._update_name_db(pindex, False)
+        paragraph = self._paragraphs.pop(pindex)
+        self._publish(ParagraphChange(pindex, 1, 0,
+                                      paragraph.get_line_count(), 0))
         if undo:
             self._add_action(DeleteParagraphAction(pindex, ptype, text))
 
+    def _new_paragraphs(self, pindex: int, paragraphs: list, undo: bool=True):
+        """Add new paragraphs (list of types and texts) at index at once."""
+        self._reformat_deferred()
+        new_paragraphs = [Paragraph(ptype, text) for ptype, text in paragraphs]
+        self._paragraphs.insert_range(pindex, new_paragraphs)
+        for i in range(pindex, pindex + len(paragraphs)):
+            self._update_name_db(i, True)
+        self._publish(ParagraphChange(
+            pindex, 0, len(new_paragraphs), 0,
+            sum(p.get_line_count() for p in new_paragraphs)))
+        if undo:
+            self._add_action(NewParagraphsAction(pindex, paragraphs))
+
+    def _delete_paragraphs(self, pindex: int, count: int, undo: bool=True):
+        """Delete count paragraphs from index on at once."""
+        self._reformat_deferred()
+        for i in range(pindex, pindex + count):
+            self._update_name_db(i, False)
+        removed = self._paragraphs.delete_range(pindex, pindex + count)
+        self._publish(ParagraphChange(
+            pindex, len(removed), 0,
+            sum(p.get_line_count() for p in removed), 0))
+        if undo:
+            self._add_action(DeleteParagraphsAction(
+                pindex, [(p.get_type(), p.get_text()[:-1]) for p in removed]))
+
+    def _move_paragraphs(self, pindex: int, count: int, dest: int,
+                         undo: bool=True):
+        """Move count paragraphs from index on to dest (index after removal)."""
+        self._reformat_deferred()
+        moved = self._paragraphs.move_range(pindex, pindex + count, dest)
+        lines = sum(p.get_line_count() for p in moved)
+        self._publish(ParagraphChange(pindex, count, 0, lines, 0))
+        self._publish(ParagraphChange(dest, 0, count, 0, lines))
+        if undo:
+            self._add_action(MoveParagraphsAction(pindex, count, dest))
+
     def _change_paragraph_type(self, pindex: int, ptype: PType, undo: bool=True):
         """Change given paragraph's type at index."""
+        self._reformat_deferred()
         prev_type = self._paragraphs[pindex].get_type()
+        old_lines = self._paragraphs[pindex].get_line_count()
+        self._update_name_db(pindex, False)
         self._paragraphs[pindex].sp_set_type(ptype)
+        self._paragraphs.refresh(pindex)
+        self._update_name_db(pindex, True)
+        self._publish_edit(pindex, old_lines, prev_type != ptype)
         if undo:
             self._add_action(ChangePTypeAction(pindex, prev_type, ptype))
 
     # HERE COME METHODS ONLY TO BE USED BY METHODS FROM PREVIOUS BLOCK
 
+    def _reformat_deferred(self):
+        """Reformat paragraphs whose reformatting has been deferred."""
+        if self._deferred:
+            for pindex, paragraph in self._deferred.items():
+                # Line count is the one from before the first deferred edit
+                old_lines = paragraph.get_line_count()
+                paragraph.sp_reformat()
+                self._paragraphs.refresh(pindex)
+                self._publish_edit(pindex, old_lines)
+            self._deferred.clear()
+
+    def _update_name_db(self, pindex: int, add: bool):
+        """Add or remove name of paragraph at index (if it's a name)."""
+        paragraph = self._paragraphs[pindex]
+        if paragraph.get_type() == PType.NAME:
+            if add:
+                self._name_db.add(paragraph.get_text()[:-1])
+            else:
+                self._name_db.remove(paragraph.get_text()[:-1])
+
     def _add_action(self, action):
         """Add action to previous actions list."""
-        if len(self._previous_actions) > 0 and self._current_action > 0:
-            self._previous_actions = \
-                self._previous_actions[self._current_action:]
-        self._current_action = 0
+        while self._current_action > 0:
+            self._undo_size -= self._previous_actions.popleft().size
+            self._current_action -= 1
 
-        if len(self._previous_actions) > 0 and\
-                self._previous_actions[0].is_relatively_new():
-            self._previous_actions[0].add_action(action)
+        new_bundle = len(self._previous_actions) == 0 or\
+            not self._previous_actions[0].is_relatively_new()
+        if self._new_bundle is not None:
+            new_bundle = self._new_bundle or len(self._previous_actions) == 0
+            # Following actions join this action's bundle
+            self._new_bundle = False
+
+        if self._journal:
+            # Whatever was recorded before the new bundle is worth writing
+            if new_bundle:
+                self._write_journal(None)
+            self._write_journal(["a", int(new_bundle), action.to_record()])
+
+        if not new_bundle:
+            bundle = self._previous_actions[0]
+            self._undo_size -= bundle.size
+            bundle.add_action(action)
+            self._undo_size += bundle.size
         else:
-            self._previous_actions.insert(0, ActionBundle(action))
-            if len(self._previous_actions) > Screenplay.MAX_ACTION_SIZE:
-                self._previous_actions = \
-                    self._previous_actions[:Screenplay.MAX_ACTION_SIZE]
+            bundle = ActionBundle(action)
+            self._previous_actions.appendleft(bundle)
+            self._undo_size += bundle.size
+
+        # Forget oldest bundles (but never the newest) when over budget
+        while self._undo_size > self._undo_budget and \
+                len(self._previous_actions) > 1:
+            self._undo_size -= self._previous_actions.pop().size
+
+        if self._journal and self._journal.needs_compaction():
+            self._reset_journal(False)
+
+    def _publish(self, change: ParagraphChange):
+        """Call subscribers with change (ending selection)."""
+        # Selection's anchor would point into changed text
+        self._selection = None
+        for subscriber in list(self._subscribers):
+            subscriber(change)
+
+    def _publish_edit(self, pindex: int, old_lines: int,
+                      type_changed: bool=False):
+        """Publish change of paragraph at index."""
+        self._publish(ParagraphChange(
+            pindex, 1, 1, old_lines,
+            self._paragraphs[pindex].get_line_count(), type_changed))
+
+    def _begin_bundle(self):
+        """Bundle all following actions (until _end_bundle()) on their own."""
+        self._new_bundle = True
+
+    def _end_bundle(self):
+        """End bundle begun with _begin_bundle()."""
+        if self._new_bundle is False:
+            # Make next action start a new bundle
+            self._previous_actions[0].last_action = 0
+        self._new_bundle = None
+
+    def _write_journal(self, record):
+        """Append record to journal (or just write pending ones if None)."""
+        try:
+            if record is None:
+                self._journal.flush()
+            else:
+                self._journal.append(record)
+        except OSError:
+            self._journal = None
+
+    def _reset_journal(self, lazy: bool=True):
+        """Restart journal with a snapshot of paragraphs and undo history.
+
+        If lazy, the journal's only written once there's something to record.
+        """
+        # Reading a saved file doesn't necessarily result in the same
+        # paragraphs, so the journal doesn't rely on it
+        records = [["s", [[p.get_type().value, p.get_text()[:-1]]
+                          for p in self._paragraphs]],
+                   ["h", [[a.to_record() for a in bundle.actions]
+                          for bundle in self._previous_actions],
+                    self._current_action]]
+        try:
+            self._journal.reset(records, lazy)
+        except OSError:
+            self._journal = None
+
+    def _apply_action(self, action):
+        """Apply action (as if done by user)."""
+        if type(action) is InputAction:
+            self._input(action.pindex, action.position, action.text)
+        elif type(action) is DeleteAction:
+            self._delete(action.pindex, action.position, len(action.text))
+        elif type(action) is NewParagraphAction:
+            self._new_paragraph(action.pindex, action.ptype, action.text)
+        elif type(action) is DeleteParagraphAction:
+            self._delete_paragraph(action.pindex)
+        elif type(action) is NewParagraphsAction:
+            self._new_paragraphs(action.pindex, action.paragraphs)
+        elif type(action) is DeleteParagraphsAction:
+            self._delete_paragraphs(action.pindex, len(action.paragraphs))
+        elif type(action) is MoveParagraphsAction:
+            self._move_paragraphs(action.pindex, action.count, action.dest)
+        elif type(action) is ChangePTypeAction:
+            self._change_paragraph_type(action.pindex, action.new_type)
 
     # OKAY, THANKS FOR YOUR UNDERSTANDING, YOU CAN GO BACK TO YOUR STUFF
 
@@ -247,15 +762,16 @@ class Screenplay(object):
             cur_par = self._paragraphs[self._cursor_par]
 
             removed = self._delete(self._cursor_par, self._cursor_pos,
-                                   len(cur_par.get_text()) -
+                                   cur_par.get_text_length() -
                                    self._cursor_pos - 1)
+            # All new paragraphs are added at once
+            paragraphs = []
+            ptype = cur_par.get_type()
             for line in text[1:]:
-                prev_par = self._cursor_par
-                self._cursor_par += 1
-                self._new_paragraph(self._cursor_par,
-                                    PPrefs.get_enter(
-                                        self._paragraphs[prev_par].get_type()),
-                                    line)
+                ptype = PPrefs.get_enter(ptype)
+                paragraphs.append((ptype, line))
+            self._new_paragraphs(self._cursor_par + 1, paragraphs)
+            self._cursor_par += len(paragraphs)
             self._cursor_pos = len(text[-1])
             self._input(self._cursor_par, self._cursor_pos, removed)
 
@@ -268,13 +784,85 @@ class Screenplay(object):
     def do_delete_forward(self):
         """Delete one character forwards from cursor position."""
         cur_par = self._paragraphs[self._cursor_par]
-        if self._cursor_pos < len(cur_par.get_text()) - 1:
+        if self._cursor_pos < cur_par.get_text_length() - 1:
             self._delete(self._cursor_par, self._cursor_pos, 1)
         elif self._cursor_par < len(self._paragraphs) - 1:
             self._input(self._cursor_par, self._cursor_pos,
                         self._paragraphs[self._cursor_par + 1].get_text()[:-1])
             self._delete_paragraph(self._cursor_par + 1)
 
+    def do_delete_range(self, start_par: int, start_pos: int, end_par: int,
+                        end_pos: int):
+        """Delete text from start to end (as one action bundle)."""
+        self._begin_bundle()
+        if start_par == end_par:
+            if start_pos < end_pos:
+                self._delete(start_par, start_pos, end_pos - start_pos)
+        else:
+            rest = self._paragraphs[end_par].get_text()[end_pos:-1]
+            length = self._paragraphs[start_par].get_text_length() - start_pos - 1
+            if length > 0:
+                self._delete(start_par, start_pos, length)
+            self._delete_paragraphs(start_par + 1, end_par - start_par)
+            if len(rest) > 0:
+                self._input(start_par, start_pos, rest)
+        self._end_bundle()
+
+        self._cursor_par = start_par
+        self._cursor_pos = start_pos
+
+    def do_set_selection(self):
+        """Start selection at cursor position (or end selection if started)."""
+        if self._selection is None:
+            self._selection = (self._cursor_par, self._cursor_pos)
+        else:
+            self._selection = None
+
+    def do_copy(self):
+        """Copy selection to clipboard and end selection."""
+        selection = self.get_selection()
+        if selection:
+            (start_par, start_pos), (end_par, end_pos) = selection
+            self._clipboard = self.get_range(start_par, start_pos,
+                                             end_par, end_pos)
+            self._selection = None
+
+    def do_cut(self):
+        """Copy selection to clipboard and delete it."""
+        selection = self.get_selection()
+        if selection:
+            (start_par, start_pos), (end_par, end_pos) = selection
+            self._clipboard = self.get_range(start_par, start_pos,
+                                             end_par, end_pos)
+            self.do_delete_range(start_par, start_pos, end_par, end_pos)
+            self._selection = None
+
+    def do_paste(self):
+        """Paste clipboard at cursor position (as one action bundle)."""
+        if len(self._clipboard) == 0:
+            return
+
+        self._begin_bundle()
+        text = self._clipboard[0][1]
+        if len(text) > 0:
+            self._input(self._cursor_par, self._cursor_pos, text)
+        self._cursor_pos += len(text)
+
+        if len(self._clipboard) > 1:
+            # Text behind cursor goes to the end of the last pasted paragraph
+            length = self._paragraphs[self._cursor_par].get_text_length() - \
+                self._cursor_pos - 1
+            rest = ""
+            if length > 0:
+                rest = self._delete(self._cursor_par, self._cursor_pos, length)
+            paragraphs = self._clipboard[1:]
+            ptype, text = paragraphs[-1]
+            paragraphs[-1] = (ptype, text + rest)
+            self._new_paragraphs(self._cursor_par + 1, paragraphs)
+            self._cursor_par += len(paragraphs)
+            self._cursor_pos = len(text)
+        self._end_bundle()
+
     def do_autocomplete_name(self):
         """Autocomplete name at cursor position."""
         cur_par = self._paragraphs[self._cursor_par]
@@ -310,12 +898,12 @@ class Screenplay(object):
         elif self._cursor_par > 0:
             self._cursor_par -= 1
             self._cursor_pos = \
-                len(self._paragraphs[self._cursor_par].get_text()) - 1
+                self._paragraphs[self._cursor_par].get_text_length() - 1
 
     def do_move_cursor_right(self):
         """Move cursor one character forward."""
         if self._cursor_pos \
-                < len(self._paragraphs[self._cursor_par].get_text()) - 1:
+                < self._paragraphs[self._cursor_par].get_text_length() - 1:
             self._cursor_pos += 1
         elif self._cursor_par < len(self._paragraphs) - 1:
             self._cursor_pos = 0
@@ -370,35 +958,66 @@ class Screenplay(object):
     def do_move_cursor_paragraph_end(self):
         """Move cursor to paragraph end."""
         self._cursor_pos = \
-            len(self._paragraphs[self._cursor_par].get_text()) - 1
+            self._paragraphs[self._cursor_par].get_text_length() - 1
 
     def do_move_cursor_prev_scene(self):
         """Move cursor to previous scene heading."""
-        for i in range(self._cursor_par - 1, -1, -1):
-            if self._paragraphs[i].get_type() == PType.SCENE:
-                self._cursor_pos = 0
-                self._cursor_par = i
-                break
-        else:
-            for i in range(len(self._paragraphs) - 1, self._cursor_par, -1):
-                if self._paragraphs[i].get_type() == PType.SCENE:
-                    self._cursor_pos = 0
-                    self._cursor_par = i
-                    break
+        scene_count = self._paragraphs.get_scene_count()
+        if scene_count == 0:
+            return
+        scene = self._paragraphs.count_scenes_before(self._cursor_par) - 1
+        if scene < 0:
+            scene = scene_count - 1
+        pindex = self._paragraphs.find_scene(scene)
+        if pindex != self._cursor_par:
+            self._cursor_pos = 0
+            self._cursor_par = pindex
 
     def do_move_cursor_next_scene(self):
         """Move cursor to next scene heading."""
-        for i in range(self._cursor_par + 1, len(self._paragraphs)):
-            if self._paragraphs[i].get_type() == PType.SCENE:
-                self._cursor_pos = 0
-                self._cursor_par = i
-                break
+        scene_count = self._paragraphs.get_scene_count()
+        if scene_count == 0:
+            return
+        scene = self._paragraphs.count_scenes_before(self._cursor_par + 1)
+        if scene >= scene_count:
+            scene = 0
+        pindex = self._paragraphs.find_scene(scene)
+        if pindex != self._cursor_par:
+            self._cursor_pos = 0
+            self._cursor_par = pindex
+
+    def do_move_scene(self, src: int, dst: int):
+        """Move scene (heading and following paragraphs) to become scene dst.
+
+        Scenes are counted from 0, paragraphs before the first scene heading
+        are never moved.
+        """
+        scene_count = self._paragraphs.get_scene_count()
+        if src == dst or not 0 <= src < scene_count \
+                or not 0 <= dst < scene_count:
+            return
+
+        start = self._paragraphs.find_scene(src)
+        end = self._paragraphs.find_scene(src + 1) \
+            if src + 1 < scene_count else len(self._paragraphs)
+        count = end - start
+        if dst < src:
+            dest = self._paragraphs.find_scene(dst)
+        elif dst + 1 < scene_count:
+            dest = self._paragraphs.find_scene(dst + 1) - count
         else:
-            for i in range(0, self._cursor_par):
-                if self._paragraphs[i].get_type() == PType.SCENE:
-                    self._cursor_pos = 0
-                    self._cursor_par = i
-                    break
+            dest = len(self._paragraphs) - count
+
+        self._move_paragraphs(start, count, dest)
+
+        # Cursor keeps its paragraph
+        if start <= self._cursor_par < end:
+            self._cursor_par += dest - start
+        else:
+            if self._cursor_par >= end:
+                self._cursor_par -= count
+            if self._cursor_par >= dest:
+                self._cursor_par += count
 
     def do_rebuild_autocomplete_db(self):
         """Rebuild name database."""
@@ -410,12 +1029,26 @@ class Screenplay(object):
     def do_save(self, path: str):
         """Save screenplay to path."""
         fountain.write(path, self._paragraphs)
+
+        if self._journaling:
+            # Saved file is the new base, the old journal is obsolete
+            if self._journal:
+                self._journal.remove()
+            self._journal = Journal(path)
         self._path = path
 
+        if self._journal:
+            self._reset_journal()
+
     def do_undo(self):
         """Undo newest action."""
         if self._current_action < len(self._previous_actions):
-            for action in self._previous_actions[self._current_action].actions:
+            if self._journal:
+                self._write_journal(["u"])
+            # Text changes are reformatted once per paragraph
+            self._deferred = {}
+            for action in reversed(
+                    self._previous_actions[self._current_action].actions):
                 if type(action) is InputAction:
                     self._delete(action.pindex, action.position, len(action.text), False)
                     self._cursor_par = action.pindex
@@ -423,7 +1056,7 @@ class Screenplay(object):
                 elif type(action) is DeleteAction:
                     self._input(action.pindex, action.position, action.text, False)
                     self._cursor_par = action.pindex
-                    self._cursor_pos = action.position + len(action.text)
+                    self._cursor_pos = action.cursor_pos
                 elif type(action) is NewParagraphAction:
                     self._delete_paragraph(action.pindex, False)
                     if self._cursor_par == action.pindex:
@@ -437,15 +1070,42 @@ class Screenplay(object):
                     self._new_paragraph(action.pindex, action.ptype, action.text, False)
                     self._cursor_par = action.pindex
                     self._cursor_pos = 0
+                elif type(action) is NewParagraphsAction:
+                    count = len(action.paragraphs)
+                    self._delete_paragraphs(action.pindex, count, False)
+                    if self._cursor_par >= action.pindex + count:
+                        self._cursor_par -= count
+                    elif self._cursor_par >= action.pindex:
+                        self._cursor_par = action.pindex - 1
+                        if self._cursor_par < 0:
+                            self._cursor_par = 0
+                            self._cursor_pos = 0
+                        else:
+                            self.do_move_cursor_paragraph_end()
+                elif type(action) is DeleteParagraphsAction:
+                    self._new_paragraphs(action.pindex, action.paragraphs, False)
+                    self._cursor_par = action.pindex
+                    self._cursor_pos = 0
+                elif type(action) is MoveParagraphsAction:
+                    self._move_paragraphs(action.dest, action.count,
+                                          action.pindex, False)
+                    self._cursor_par = action.pindex
+                    self._cursor_pos = 0
                 elif type(action) is ChangePTypeAction:
                     self._change_paragraph_type(action.pindex, action.prev_type, False)
+            self._reformat_deferred()
+            self._deferred = None
             self._current_action += 1
 
     def do_redo(self):
         """Redo recently undone action."""
         if self._current_action > 0:
+            if self._journal:
+                self._write_journal(["r"])
             self._current_action -= 1
-            for action in reversed(self._previous_actions[self._current_action].actions):
+            # Text changes are reformatted once per paragraph
+            self._deferred = {}
+            for action in self._previous_actions[self._current_action].actions:
                 if type(action) is InputAction:
                     self._input(action.pindex, action.position, action.text, False)
                     self._cursor_par = action.pindex
@@ -469,22 +1129,129 @@ class Screenplay(object):
                             self._cursor_pos = 0
                         else:
                             self.do_move_cursor_paragraph_end()
+                elif type(action) is NewParagraphsAction:
+                    self._new_paragraphs(action.pindex, action.paragraphs, False)
+                    self._cursor_par = action.pindex + len(action.paragraphs) - 1
+                    self._cursor_pos = 0
+                elif type(action) is DeleteParagraphsAction:
+                    count = len(action.paragraphs)
+                    self._delete_paragraphs(action.pindex, count, False)
+                    if self._cursor_par >= action.pindex + count:
+                        self._cursor_par -= count
+                    elif self._cursor_par >= action.pindex:
+                        self._cursor_par = action.pindex - 1
+                        if self._cursor_par < 0:
+                            self._cursor_par = 0
+                            self._cursor_pos = 0
+                        else:
+                            self.do_move_cursor_paragraph_end()
+                elif type(action) is MoveParagraphsAction:
+                    self._move_paragraphs(action.pindex, action.count,
+                                          action.dest, False)
+                    self._cursor_par = action.dest
+                    self._cursor_pos = 0
                 elif type(action) is ChangePTypeAction:
                     self._change_paragraph_type(action.pindex, action.new_type, False)
+            self._reformat_deferred()
+            self._deferred = None
+
+    def subscribe(self, subscriber):
+        """Call subscriber with every paragraph change (see ParagraphChange)."""
+        self._subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber):
+        """Stop calling subscriber with paragraph changes."""
+        self._subscribers.remove(subscriber)
+
+    def flush(self):
+        """Write journal records pending so far (e.g. while user's idle)."""
+        if self._journal:
+            self._write_journal(None)
+
+    def close(self, clean: bool=True):
+        """Close screenplay.
+
+        A clean close (user quit) removes the journal, discarding unsaved
+        changes. Otherwise everything is written to the journal to be restored
+        when opening the screenplay again.
+        """
+        if self._journal:
+            try:
+                if clean:
+                    self._journal.remove()
+                else:
+                    self._journal.close()
+            except OSError:
+                pass
+            self._journal = None
+
+    def get_range(self, start_par: int, start_pos: int, end_par: int,
+                  end_pos: int) -> list:
+        """Return text from start to end as list of paragraph types and texts."""
+        paragraph = self._paragraphs[start_par]
+        if start_par == end_par:
+            return [(paragraph.get_type(),
+                     paragraph.get_text()[start_pos:end_pos])]
+
+        result = [(paragraph.get_type(), paragraph.get_text()[start_pos:-1])]
+        for pindex in range(start_par + 1, end_par):
+            paragraph = self._paragraphs[pindex]
+            result.append((paragraph.get_type(), paragraph.get_text()[:-1]))
+        paragraph = self._paragraphs[end_par]
+        result.append((paragraph.get_type(), paragraph.get_text()[:end_pos]))
+        return result
+
+    def get_selection(self):
+        """Return selection's start and end (as paragraph index and position).
+
+        Returns None if there is no selection.
+        """
+        if self._selection is None:
+            return None
+        anchor_par = min(self._selection[0], len(self._paragraphs) - 1)
+        anchor_pos = min(self._selection[1], self._paragraphs[
+            anchor_par].get_text_length() - 1)
+        anchor = (anchor_par, anchor_pos)
+        cursor = (self._cursor_par, self._cursor_pos)
+        return min(anchor, cursor), max(anchor, cursor)
 
     def get_pindex_at_line(self, line: int) -> (int, int):
         """Return paragraph's index for line and offset into said paragraph."""
-        for index in range(len(self._paragraphs)):
-            length = self._paragraphs[index].get_line_count()
-            if line < length:
-                return index, line
-            line -= length
-        raise ValueError("Not enough lines in screenplay!")
+        return self._paragraphs.find_line(line)
+
+    def get_line_offset(self, pindex: int) -> int:
+        """Return number of lines before paragraph at index."""
+        if pindex >= len(self._paragraphs):
+            return self._paragraphs.get_line_count()
+        return self._paragraphs.get_line_offset(pindex)
 
     def get_paragraph_at_index(self, index: int) -> Paragraph:
         """Return paragraph at index."""
         return self._paragraphs[index]
 
+    def iter_scenes(self):
+        """Iterate over scene headings as tuples of index and paragraph."""
+        for pindex in self._paragraphs.iter_scenes():
+            yield pindex, self._paragraphs[pindex]
+
+    def scene_at(self, pindex: int) -> int:
+        """Return index of scene heading paragraph at index belongs to.
+
+        Returns -1 for paragraphs before the first scene heading.
+        """
+        scene = self._paragraphs.count_scenes_before(pindex + 1)
+        if scene == 0:
+            return -1
+        return self._paragraphs.find_scene(scene - 1)
+
+    def get_scene_count(self) -> int:
+        """Return number of scene headings."""
+        return self._paragraphs.get_scene_count()
+
+    def get_cursor_scene(self) -> int:
+        """Return number of scene cursor is in (-1 before first scene)."""
+        return self._paragraphs.count_scenes_before(self._cursor_par + 1) - 1
+
     def get_paragraph_count(self) -> int:
         """Return number of paragraphs."""
         return len(self._paragraphs)
@@ -493,9 +1260,7 @@ class Screenplay(object):
         """Return cursor's paragraph index and position in paragraph."""
         line, col = self._paragraphs[self._cursor_par]\
             .get_line_column_at_pos(self._cursor_pos)
-        for i in range(0, self._cursor_par):
-            line += self._paragraphs[i].get_line_count()
-        return line, col
+        return line + self._paragraphs.get_line_offset(self._cursor_par), col
 
     def get_cursor_paragraph(self) -> Paragraph:
         """Return cursor's paragraph."""
@@ -507,14 +1272,7 @@ class Screenplay(object):
 
     def get_line_count(self) -> int:
         """Get number of lines."""
-        # TODO Optimize (e.g. calculate line count once for every change)
-        # Some hints:
-        # - Paragraph conversion: Subtract par line count, convert, add new
-        # - Input into same paragraph (no \n): Same as paragraph conversion
-        count = 0
-        for paragraph in self._paragraphs:
-            count += paragraph.get_line_count()
-        return count
+        return self._paragraphs.get_line_count()
 
     def __str__(self) -> str:
         """Return screenplay as string."""
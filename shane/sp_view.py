@@ -18,13 +18,15 @@
 
 import curses
 from enum import Enum
+from itertools import islice
+from operator import eq
 
-from shane.screenplay import Screenplay, PPrefs, PType
+from shane.screenplay import Screenplay, ParagraphChange, PPrefs, PType
 from shane.view import View
 
 
 class ScreenplayViewEvent(Enum):
-    """Enum for results from editing mainloop."""
+    """Enum for events from editing view."""
     ESCAPE = 0
     RESIZE = 1
 
@@ -32,66 +34,143 @@ class ScreenplayViewEvent(Enum):
 class ScreenplayView(View):
     """View for screenplay editing."""
 
-    def __init__(self, screenplay: Screenplay):
-        """Initialize screenplay view."""
+    # Lines kept in pad (when drawing on a pad) and lines drawn on it at once
+    PAD_LINES = 1024
+    PAD_CHUNK = 64
+
+    # Milliseconds to wait after a lone ESC for a bracketed paste start
+    ESCAPE_DELAY = 25
+
+    def __init__(self, screenplay: Screenplay, use_pad: bool=False):
+        """Initialize screenplay view.
+
+        With use_pad lines are drawn on a pad holding many more lines than
+        visible and scrolling only changes which of them are shown.
+        """
         super().__init__(screenplay)
 
         self._top_line = 0
 
-    def run(self):
-        """Run screenplay view's mainloop."""
-        super().run()
+        # Keys pasted so far (None if not within a paste)
+        self._paste = None
 
-        while True:
-            self._draw()
+        self._use_pad = use_pad
+        self._pad = None
+        # First line in pad, if its chunks are drawn, selection they're drawn
+        # with and first line changed since (or None)
+        self._pad_top_line = 0
+        self._pad_chunks = []
+        self._pad_selection = None
+        self._pad_damage = None
+
+        # Rows on screen (None if unknown), their top line and number of lines
+        # inserted (or removed if negative) since they were drawn
+        self._rows = None
+        self._rows_top_line = 0
+        self._line_delta = 0
+
+        # Every change to the screenplay's paragraphs needs drawing
+        screenplay.subscribe(self._on_paragraph_change)
+
+    def start(self):
+        """Start view (it's now the one handling keys)."""
+        super().start()
+
+        # Have terminal mark pasted text
+        curses.putp(b"\x1b[?2004h")
 
-            char = self._window.get_wch()
+    def stop(self):
+        """Stop view (another view handles keys from now on)."""
+        super().stop()
+        curses.putp(b"\x1b[?2004l")
+
+    def handle_keys(self, keys):
+        """Handle keys taken from deque, then draw.
+
+        Return an event if view wants to be left, leaving keys it didn't handle
+        in deque.
+        """
+        while len(keys) > 0:
+            if self._paste is not None:
+                # Rest of paste is yet to be read
+                if not self._read_paste(keys):
+                    break
+                text = self._get_paste_text()
+                self._paste = None
+                if len(text) > 0:
+                    self._screenplay.do_input(text)
+                continue
+
+            char = keys.popleft()
             if type(char) is str:
                 asc = ord(char)
 
-                if asc == 8:  # Backspace
-                    self._screenplay.do_delete_backward()
+                if asc == 0:  # Ctrl + Space
+                    self._screenplay.do_set_selection()
                     self._dirty = True
+                elif asc == 8:  # Backspace
+                    self._screenplay.do_delete_backward()
                 elif asc == 9:  # Tab
                     self._screenplay.do_convert_tab_style()
-                    self._dirty = True
                 elif asc == 10:  # Enter
                     if self._screenplay.get_cursor_paragraph().get_type() \
                             == PType.NAME:
                         self._screenplay.do_move_cursor_paragraph_end()
                     self._screenplay.do_input("\n")
+                elif asc == 11:  # Ctrl + K
+                    self._screenplay.do_copy()
+                    self._dirty = True
+                elif asc == 16:  # Ctrl + P
+                    self._screenplay.do_paste()
+                elif asc == 24:  # Ctrl + X
+                    self._screenplay.do_cut()
                     self._dirty = True
                 elif asc == 27:  # ESC
-                    self._window.nodelay(True)
-                    asc = self._window.getch()
-                    self._window.nodelay(False)
-                    if asc == -1:
-                        return ScreenplayViewEvent.ESCAPE
+                    following = list(islice(keys, 5))
+                    if following == list("[200~"):
+                        for _ in range(5):
+                            keys.popleft()
+                        self._paste = []
+                    elif 0 < len(following) < 5 \
+                            and following == list("[200~"[:len(following)]):
+                        # Bracketed paste start hasn't been read completely
+                        keys.appendleft(char)
+                        break
+                    elif len(following) == 0:
+                        # Terminal might still be sending paste start
+                        self.wait_for_keys(keys, ScreenplayView.ESCAPE_DELAY)
+                        if len(keys) == 0:
+                            return ScreenplayViewEvent.ESCAPE
+                        keys.appendleft(char)
+                    else:
+                        keys.popleft()
                 elif asc == 95:  # Underscore
                     if self._screenplay.get_cursor_paragraph().get_type() \
                             == PType.NAME:
                         self._screenplay.do_autocomplete_name()
                     else:
                         self._screenplay.do_input("_")
-                    self._dirty = True
                 elif asc == 127:  # Delete
                     self._screenplay.do_delete_forward()
-                    self._dirty = True
                 elif 32 <= asc:  # Letter (except underscore)
-                    self._screenplay.do_input(char)
-                    self._dirty = True
+                    # Letters typed ahead are input at once
+                    text = [char]
+                    name = self._screenplay.get_cursor_paragraph().get_type() \
+                        == PType.NAME
+                    while len(keys) > 0 \
+                            and type(keys[0]) is str \
+                            and 32 <= ord(keys[0]) != 127 \
+                            and not (name and keys[0] == "_"):
+                        text.append(keys.popleft())
+                    self._screenplay.do_input("".join(text))
             elif char == curses.KEY_BACKSPACE:
                 self._screenplay.do_delete_backward()
-                self._dirty = True
             elif char == curses.KEY_DC:
                 self._screenplay.do_delete_forward()
-                self._dirty = True
             elif char == curses.KEY_SLEFT:  # Shift + left
                 self._screenplay.do_convert_to_prev_ptype()
-                self._dirty = True
             elif char == curses.KEY_SRIGHT:  # Shift + right
                 self._screenplay.do_convert_to_next_ptype()
-                self._dirty = True
             elif char == curses.KEY_LEFT:
                 self._screenplay.do_move_cursor_left()
             elif char == curses.KEY_RIGHT:
@@ -112,9 +191,71 @@ class ScreenplayView(View):
                 self._screenplay.do_move_cursor_next_scene()
                 self._top_line = self._screenplay.get_cursor_info()[0]
                 self._dirty = True
+            elif char == curses.KEY_SPREVIOUS:  # Shift + page up
+                scene = self._screenplay.get_cursor_scene()
+                if scene > 0:
+                    self._screenplay.do_move_scene(scene, scene - 1)
+            elif char == curses.KEY_SNEXT:  # Shift + page down
+                scene = self._screenplay.get_cursor_scene()
+                if 0 <= scene < self._screenplay.get_scene_count() - 1:
+                    self._screenplay.do_move_scene(scene, scene + 1)
             elif char == curses.KEY_RESIZE:
                 return ScreenplayViewEvent.RESIZE
 
+        # Selection follows cursor
+        if self._screenplay.get_selection() is not None:
+            self._dirty = True
+
+        self._draw()
+
+    def _read_paste(self, keys) -> bool:
+        """Move pasted keys from deque to paste, return if paste has ended."""
+        while len(keys) > 0:
+            char = keys[0]
+            if char == "\x1b":
+                # Bracketed paste end might not have been read completely
+                if len(keys) < 6:
+                    return False
+                if list(islice(keys, 1, 6)) == list("[201~"):
+                    for _ in range(6):
+                        keys.popleft()
+                    return True
+            keys.popleft()
+            if type(char) is str:
+                self._paste.append(char)
+        return False
+
+    def _get_paste_text(self) -> str:
+        """Return text pasted (without control characters except newlines)."""
+        text = "".join(self._paste).replace("\r\n", "\n").replace("\r", "\n")
+        return "".join(" " if c == "\t" else c for c in text
+                       if c == "\n" or c == "\t" or 32 <= ord(c) != 127)
+
+    def _on_paragraph_change(self, change: ParagraphChange):
+        """Mark view for redrawing after paragraph change."""
+        self._line_delta += change.new_lines - change.old_lines
+        if self._use_pad:
+            line = self._screenplay.get_line_offset(change.pindex)
+            if self._pad_damage is None or line < self._pad_damage:
+                self._pad_damage = line
+        self._dirty = True
+
+    def set_window(self, window):
+        """Set ncurses window to draw on."""
+        self._rows = None
+        window.idlok(True)
+        if self._use_pad:
+            height, width = window.getmaxyx()
+            self._pad = curses.newpad(max(ScreenplayView.PAD_LINES,
+                                          2 * height), width - 1)
+            self._pad_chunks = []
+        super().set_window(window)
+
+    def remove_window(self):
+        """Remove ncurses window."""
+        super().remove_window()
+        self._pad = None
+
     def _draw(self):
         """Draw screenplay."""
         cursor_line, cursor_column = self._screenplay.get_cursor_info()
@@ -134,46 +275,10 @@ class ScreenplayView(View):
             cursor_line = 0
             self._dirty = True
 
-        if self._dirty:
-            par_index, line_off = \
-                self._screenplay.get_pindex_at_line(self._top_line)
-
-            self._window.clear()
-
-            current_line = 0
-            while current_line < self._height\
-                    and par_index < self._screenplay.get_paragraph_count():
-                paragraph = self._screenplay.get_paragraph_at_index(par_index)
-                lines = paragraph.get_lines()
-                ptype = paragraph.get_type()
-                indent = PPrefs.get_indent(ptype)
-                width = PPrefs.get_width(ptype)
-
-                for i in range(line_off, len(lines)):
-                    if current_line < self._height:
-                        if ptype == PType.SCENE:
-                            self._window.addnstr(current_line, indent,
-                                                 lines[i].upper(), width,
-                                                 curses.A_BOLD)
-                        elif ptype == PType.PARENTHETICALS:
-                            if i == 0:
-                                self._window.addstr(current_line, indent - 1,
-                                                    "(")
-                            if i == len(lines) - 1:
-                                self._window.addstr(current_line,
-                                                    indent + len(lines[i]) - 1,
-                                                    ")")
-                            self._window.addnstr(current_line, indent, lines[i],
-                                                 width)
-                        else:
-                            self._window.addnstr(current_line, indent, lines[i],
-                                                 width)
-                    else:
-                        break
-                    current_line += 1
-
-                line_off = 0
-                par_index += 1
+        if self._pad:
+            self._update_pad()
+        elif self._dirty:
+            self._update_rows(self._render_rows(self._top_line, self._height))
 
         for y in range(0, self._height - 1):
             self._window.addstr(y, self._width - 1, "|")
@@ -182,16 +287,200 @@ class ScreenplayView(View):
         cursor_paragraph = self._screenplay.get_cursor_paragraph()
         cursor_ptype = cursor_paragraph.get_type()
         cursor_indent = PPrefs.get_indent(cursor_ptype)
-        self._window.move(cursor_line, min(cursor_indent + cursor_column,
-                                           cursor_indent +
-                                           PPrefs.get_width(cursor_ptype)))
+        cursor_x = min(cursor_indent + cursor_column,
+                       cursor_indent + PPrefs.get_width(cursor_ptype))
 
-        self._window.refresh()
+        if self._pad:
+            # Pad is shown on top of window, the cursor's in the pad (and in
+            # the window for refreshes when reading keys)
+            self._window.move(cursor_line, cursor_x)
+            self._window.noutrefresh()
+            pad_line = self._top_line - self._pad_top_line
+            self._pad.move(pad_line + cursor_line, cursor_x)
+            y, x = self._window.getbegyx()
+            self._pad.noutrefresh(pad_line, 0, y, x, y + self._height - 1,
+                                  x + self._width - 2)
+            curses.doupdate()
+        else:
+            self._window.move(cursor_line, cursor_x)
+            self._window.refresh()
 
         self._dirty = False
 
+    def _render_rows(self, line: int, count: int) -> list:
+        """Return contents of count rows from line on.
+
+        A row's contents is a tuple of (column, text, attr) tuples.
+        """
+        rows = []
+
+        if line < self._screenplay.get_line_count():
+            par_index, line_off = self._screenplay.get_pindex_at_line(line)
+        else:
+            par_index, line_off = self._screenplay.get_paragraph_count(), 0
+        selection = self._screenplay.get_selection()
+
+        while len(rows) < count\
+                and par_index < self._screenplay.get_paragraph_count():
+            paragraph = self._screenplay.get_paragraph_at_index(par_index)
+            lines = paragraph.get_lines()
+            for i in range(line_off, min(len(lines),
+                                         line_off + count - len(rows))):
+                rows.append(self._render_line(paragraph, par_index, i,
+                                              selection))
+            line_off = 0
+            par_index += 1
+
+        rows.extend(() for _ in range(count - len(rows)))
+        return rows
+
+    def _render_line(self, paragraph, par_index: int, line: int,
+                     selection) -> tuple:
+        """Return contents of paragraph's line as tuple of (column, text, attr).
+        """
+        lines = paragraph.get_lines()
+        ptype = paragraph.get_type()
+        indent = PPrefs.get_indent(ptype)
+
+        # Paragraph's last line ends with a null character
+        text = lines[line]
+        if text.endswith("\0"):
+            text = text[:-1]
+        text = text[:PPrefs.get_width(ptype)]
+
+        attr = curses.A_NORMAL
+        if ptype == PType.SCENE:
+            text = text.upper()
+            attr = curses.A_BOLD
+
+        result = []
+        if ptype == PType.PARENTHETICALS and line == 0:
+            result.append((indent - 1, "(", curses.A_NORMAL))
+
+        # Selected part of text is highlighted
+        start = end = 0
+        line_start = paragraph.get_pos_at_line_column(line, 0)
+        if selection and line_start >= 0:
+            (start_par, start_pos), (end_par, end_pos) = selection
+            if start_par <= par_index <= end_par:
+                end = len(text)
+                if par_index == start_par:
+                    start = max(start_pos - line_start, 0)
+                if par_index == end_par:
+                    end = min(end_pos - line_start, end)
+        if start < end:
+            for column, part, part_attr in ((0, text[:start], attr),
+                                            (start, text[start:end],
+                                             attr | curses.A_REVERSE),
+                                            (end, text[end:], attr)):
+                if part:
+                    result.append((indent + column, part, part_attr))
+        elif text:
+            result.append((indent, text, attr))
+
+        if ptype == PType.PARENTHETICALS and line == len(lines) - 1:
+            result.append((indent + len(text), ")", curses.A_NORMAL))
+
+        return tuple(result)
+
+    def _update_rows(self, rows: list):
+        """Draw rows that differ from the ones on screen.
+
+        Rows still on screen after scrolling or after lines were inserted or
+        removed above them are moved by inserting and deleting lines instead of
+        drawing them again.
+        """
+        if self._rows is None:
+            self._window.erase()
+            self._rows = [()] * self._height
+        else:
+            scroll = self._top_line - self._rows_top_line
+            if 0 < abs(scroll) < self._height:
+                self._insert_rows(0, -scroll)
+            elif scroll != 0:
+                self._rows = [None] * self._height
+
+            # Lines inserted or removed by changes since last draw
+            first = next((i for i in range(self._height)
+                          if self._rows[i] != rows[i]), None)
+            shift = self._line_delta
+            if first is not None and 0 < abs(shift) < self._height - first:
+                if shift > 0:
+                    shifted = self._rows[:first] + [()] * shift + \
+                        self._rows[first:self._height - shift]
+                else:
+                    shifted = self._rows[:first] + self._rows[first - shift:] + \
+                        [()] * -shift
+                if sum(map(eq, shifted, rows)) > sum(map(eq, self._rows, rows)):
+                    self._insert_rows(first, shift)
+        self._rows_top_line = self._top_line
+        self._line_delta = 0
+
+        for y in range(self._height):
+            if self._rows[y] != rows[y]:
+                self._window.move(y, 0)
+                self._window.clrtoeol()
+                for column, text, attr in rows[y]:
+                    self._window.addstr(y, column, text, attr)
+                self._rows[y] = rows[y]
+
+    def _update_pad(self):
+        """Draw chunks of pad lines in view not drawn yet."""
+        pad_lines = self._pad.getmaxyx()[0]
+        chunk_count = -(-pad_lines // ScreenplayView.PAD_CHUNK)
+
+        # Recenter pad if view left it
+        if len(self._pad_chunks) == 0 \
+                or self._top_line < self._pad_top_line \
+                or self._top_line + self._height > \
+                self._pad_top_line + pad_lines:
+            self._pad_top_line = max(
+                self._top_line - (pad_lines - self._height) // 2, 0)
+            self._pad_chunks = [False] * chunk_count
+
+        # Everything behind a change and every selected line needs drawing
+        selection = self._screenplay.get_selection()
+        if selection != self._pad_selection:
+            self._pad_chunks = [False] * chunk_count
+            self._pad_selection = selection
+        if self._pad_damage is not None:
+            first = max(self._pad_damage - self._pad_top_line, 0) // \
+                ScreenplayView.PAD_CHUNK
+            for chunk in range(first, chunk_count):
+                self._pad_chunks[chunk] = False
+            self._pad_damage = None
+
+        first = (self._top_line - self._pad_top_line) // \
+            ScreenplayView.PAD_CHUNK
+        last = (self._top_line - self._pad_top_line + self._height - 1) // \
+            ScreenplayView.PAD_CHUNK
+        for chunk in range(first, last + 1):
+            if not self._pad_chunks[chunk]:
+                start = chunk * ScreenplayView.PAD_CHUNK
+                count = min(ScreenplayView.PAD_CHUNK, pad_lines - start)
+                rows = self._render_rows(self._pad_top_line + start, count)
+                for y in range(count):
+                    self._pad.move(start + y, 0)
+                    self._pad.clrtoeol()
+                    for column, text, attr in rows[y]:
+                        self._pad.addstr(start + y, column, text, attr)
+                self._pad_chunks[chunk] = True
+
+    def _insert_rows(self, y: int, count: int):
+        """Insert count empty rows at y (or delete rows if count < 0)."""
+        self._window.move(y, 0)
+        self._window.insdelln(count)
+        if count > 0:
+            self._rows[y:y] = [()] * count
+            del self._rows[self._height:]
+            # Scrollbar (which never reaches the last row) got pushed into it
+            self._rows[-1] = None
+        else:
+            del self._rows[y:y - count]
+            self._rows.extend([()] * -count)
+
     def redraw(self):
-        """Completely redraw screen view."""
+        """Redraw screen view (e.g. after changes from outside the view)."""
         self._dirty = True
         if self._window:
             self._draw()
@@ -16,6 +16,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import curses
+
 from shane.screenplay import Screenplay
 
 
@@ -30,10 +32,41 @@ class View(object):
         self._height = 0
         self._dirty = False
 
-    def run(self):
-        """Run view (most likely run a main loop)."""
+    def start(self):
+        """Start view (it's now the one handling keys)."""
         self._dirty = True
 
+    def stop(self):
+        """Stop view (another view handles keys from now on)."""
+        pass
+
+    def handle_keys(self, keys):
+        """Handle keys taken from deque, then draw.
+
+        Return an event if view wants to be left, leaving keys it didn't handle
+        in deque.
+        """
+        raise NotImplementedError("handle_keys() not implemented!")
+
+    def read_keys(self, keys):
+        """Append all keys read so far (without waiting) to deque."""
+        try:
+            while True:
+                keys.append(self._window.get_wch())
+        except curses.error:
+            pass
+
+    def wait_for_keys(self, keys, delay: int):
+        """Append keys read within delay milliseconds (if any) to deque."""
+        self._window.timeout(delay)
+        try:
+            keys.append(self._window.get_wch())
+        except curses.error:
+            return
+        finally:
+            self._window.nodelay(True)
+        self.read_keys(keys)
+
     def _draw(self):
         """Draw view contents."""
         raise NotImplementedError("_draw() not implemented!")
@@ -42,6 +75,7 @@ class View(object):
         """Set ncurses window to draw on."""
         self._window = window
         self._window.keypad(True)
+        self._window.nodelay(True)
         self._height, self._width = self._window.getmaxyx()
         self._dirty = True
         self._draw()
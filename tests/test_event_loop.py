@@ -0,0 +1,59 @@
+# coding=utf-8
+
+# Shane - a poor man and/or hipster's TUI screenwriting software
+# Copyright (C) 2016 Tobias Heukäufer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import unittest
+
+from shane.event_loop import EventLoop
+
+
+class BackgroundTaskTest(unittest.TestCase):
+    """Tests for running functions in the background."""
+
+    def setUp(self):
+        """Create event loop."""
+        self.loop = EventLoop()
+        self.addCleanup(self.loop.close)
+
+    def test_result_handed_to_loop(self):
+        """Test if callback gets result in loop's thread."""
+        results = []
+
+        def on_finished(future):
+            results.append((future.result(), threading.get_ident()))
+            self.loop.stop()
+
+        self.loop.run_in_background(pow, on_finished, 2, 10)
+        self.loop.run()
+        self.assertEqual(results, [(1024, threading.get_ident())])
+
+    def test_exception_handed_to_loop(self):
+        """Test if callback gets exception raised in worker thread."""
+        futures = []
+
+        def on_finished(future):
+            futures.append(future)
+            self.loop.stop()
+
+        self.loop.run_in_background(int, on_finished, "no number")
+        self.loop.run()
+        self.assertIsInstance(futures[0].exception(), ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+# coding=utf-8
+
+# Shane - a poor man and/or hipster's TUI screenwriting software
+# Copyright (C) 2016 Tobias Heukäufer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import tempfile
+import unittest
+
+from shane.io import fountain
+from shane.paragraph import Paragraph, PType
+
+# Scripts and the paragraph types and texts the reader read them as before it
+# became a streaming, memory mapped reader
+SCRIPTS = {
+    "scenes_and_dialog": (
+        "INT. HOUSE - DAY\n\nJohn enters the room.\nHe sits down.\n\nJOHN\n"
+        "(quietly)\nHello there.\nHow are you?\n\nMARY (V.O.)\nFine.\n\n"
+        "EXT. STREET - NIGHT\n\nTHE END.\n",
+        [(PType.SCENE, "INT. HOUSE - DAY"),
+         (PType.ACTION, "John enters the room."),
+         (PType.ACTION, "He sits down."),
+         (PType.NAME, "JOHN"),
+         (PType.PARENTHETICALS, "quietly"),
+         (PType.DIALOG, "Hello there.How are you?"),
+         (PType.NAME, "MARY (V.O.)"),
+         (PType.DIALOG, "Fine."),
+         (PType.SCENE, "EXT. STREET - NIGHT"),
+         (PType.NAME, "THE END.")]),
+    "forced": (
+        ".FLASHBACK\n\n@mcdonald\nBig Mac.\n\n!INT. NOT A SCENE\n\nI/E CAR\n\n"
+        "int./ext. porch\n",
+        [(PType.SCENE, "FLASHBACK"),
+         (PType.NAME, "mcdonald"),
+         (PType.DIALOG, "Big Mac."),
+         (PType.ACTION, "INT. NOT A SCENE"),
+         (PType.SCENE, "I/E CAR"),
+         (PType.SCENE, "int./ext. porch")]),
+    "hints_at_end": (
+        "\n\n\nINT. A\nstill action\n\nNOBODY\n\nEST.",
+        [(PType.NAME, "INT. A"),
+         (PType.DIALOG, "still action"),
+         (PType.ACTION, "NOBODY"),
+         (PType.SCENE, "EST.")]),
+    "parentheticals": (
+        "ANNA\n(whispering)\nYes.\n(louder)\nNo!\n()\n\n(alone)\n",
+        [(PType.NAME, "ANNA"),
+         (PType.PARENTHETICALS, "whispering"),
+         (PType.DIALOG, "Yes."),
+         (PType.PARENTHETICALS, "louder"),
+         (PType.DIALOG, "No!"),
+         (PType.PARENTHETICALS, ""),
+         (PType.ACTION, "(alone)")]),
+    "long_dialog": (
+        "HANS\nThis is a rather long line of dialog that goes on and on.\n"
+        "And another one that is long enough to wrap around as well.\n",
+        [(PType.NAME, "HANS"),
+         (PType.DIALOG, "This is a rather long line of dialog that goes on and "
+                        "on.And another one that is long enough to wrap "
+                        "around as well.")]),
+    "crlf": (
+        "EXT. PARK\r\n\r\nBOB\r\nHi.\r\n\r\nÉ ÜBER\r\nÇa va.\r\n",
+        [(PType.SCENE, "EXT. PARK"),
+         (PType.NAME, "BOB"),
+         (PType.DIALOG, "Hi."),
+         (PType.NAME, "É ÜBER"),
+         (PType.DIALOG, "Ça va.")]),
+    "cr": (
+        "INT. CAR\r\rBOB\rHi.\r",
+        [(PType.SCENE, "INT. CAR"),
+         (PType.NAME, "BOB"),
+         (PType.DIALOG, "Hi.")]),
+    "empty": ("", []),
+}
+
+
+class ScriptTestCase(unittest.TestCase):
+    """Base for tests reading scripts written to a temporary directory."""
+
+    def setUp(self):
+        """Create directory for scripts."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_script(self, text: str) -> str:
+        """Write script text (keeping its line ends) and return its path."""
+        path = os.path.join(self.directory, "script.fountain")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.write(text)
+        return path
+
+    def assertParagraphs(self, paragraphs: list, expected: list):
+        """Assert paragraphs have expected types and texts and are wrapped."""
+        self.assertEqual([(p.get_type(), p.get_text()[:-1])
+                          for p in paragraphs], expected)
+        for paragraph in paragraphs:
+            self.assertEqual(paragraph.get_lines(), Paragraph(
+                paragraph.get_type(), paragraph.get_text()[:-1]).get_lines())
+
+
+class ReadTest(ScriptTestCase):
+    """Tests comparing read scripts with what they used to be read as."""
+
+    def test_read(self):
+        """Test if scripts read from path are read as before."""
+        for name, (text, expected) in SCRIPTS.items():
+            with self.subTest(script=name):
+                self.assertParagraphs(fountain.read(self.write_script(text)),
+                                      expected)
+
+    def test_iter_read_stream(self):
+        """Test if scripts read from text streams are read as before."""
+        for name, (text, expected) in SCRIPTS.items():
+            with self.subTest(script=name):
+                with open(self.write_script(text), encoding="utf-8") as file:
+                    self.assertParagraphs(list(fountain.iter_read(file)),
+                                          expected)
+
+
+class ReadParallelTest(ScriptTestCase):
+    """Tests comparing scripts read in parallel with scripts read serially."""
+
+    def setUp(self):
+        """Create directory for scripts and read even tiny ones in parallel."""
+        super().setUp()
+        threshold = fountain.PARALLEL_THRESHOLD
+        fountain.PARALLEL_THRESHOLD = 0
+        self.addCleanup(setattr, fountain, "PARALLEL_THRESHOLD", threshold)
+
+    def test_read_parallel(self):
+        """Test if scripts read in parallel are read as before."""
+        for name, (text, expected) in SCRIPTS.items():
+            with self.subTest(script=name):
+                self.assertParagraphs(
+                    fountain.read_parallel(self.write_script(text), 2),
+                    expected)
+
+    def test_read_parallel_parts(self):
+        """Test if a script split into many parts is read as a whole."""
+        text = "\n\n".join(text for text, expected in SCRIPTS.values()) * 20
+        path = self.write_script(text)
+        expected = [(p.get_type(), p.get_text()[:-1])
+                    for p in fountain.read(path)]
+        for workers in (2, 3, 8):
+            with self.subTest(workers=workers):
+                self.assertParagraphs(fountain.read_parallel(path, workers),
+                                      expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# coding=utf-8
+
+# Shane - a poor man and/or hipster's TUI screenwriting software
+# Copyright (C) 2016 Tobias Heukäufer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+import unittest
+
+from shane.paragraph import Paragraph, PType
+
+
+class DeferredReformatTest(unittest.TestCase):
+    """Tests for edits whose reformatting is deferred."""
+
+    def test_lines_read_before_reformat(self):
+        """Test if lines read before sp_reformat() don't stay cached."""
+        paragraph = Paragraph(PType.ACTION, "hello")
+        paragraph.sp_input(5, " world " * 30, False)
+        paragraph.get_lines()
+        version = paragraph.get_version()
+
+        paragraph.sp_reformat()
+        self.assertNotEqual(paragraph.get_version(), version)
+        self.assertEqual(len(paragraph.get_lines()),
+                         paragraph.get_line_count())
+        self.assertEqual(paragraph.get_line_count(), Paragraph(
+            PType.ACTION, paragraph.get_text()[:-1]).get_line_count())
+
+
+class IncrementalReformatTest(unittest.TestCase):
+    """Tests comparing rewrapping around edits with rewrapping everything."""
+
+    WORDS = ["a", "int.", "house", "supercalifragilistic", "-", "  ", " ",
+             "x" * 70, "\n", "(yes)"]
+
+    def assertSameLines(self, paragraph: Paragraph):
+        """Assert paragraph is wrapped like a new paragraph with its text."""
+        reference = Paragraph(paragraph.get_type(),
+                              paragraph.get_text()[:-1])
+        self.assertEqual(paragraph.get_lines(), reference.get_lines())
+        self.assertEqual(paragraph.get_line_count(),
+                         reference.get_line_count())
+
+    def edit(self, rnd: random.Random, paragraph: Paragraph,
+             reformat: bool):
+        """Input or delete some random text at a random position."""
+        pos = rnd.randint(0, paragraph.get_text_length() - 1)
+        if rnd.random() < 0.6:
+            text = "".join(rnd.choice(IncrementalReformatTest.WORDS) + " "
+                           for _ in range(rnd.randint(1, 8)))
+            paragraph.sp_input(pos, text, reformat)
+        else:
+            length = min(rnd.randint(1, 40),
+                         paragraph.get_text_length() - 1 - pos)
+            paragraph.sp_delete(pos, length, reformat)
+
+    def test_edits(self):
+        """Test if every edit leaves lines as a full rewrap would."""
+        rnd = random.Random(0)
+        for ptype in PType:
+            paragraph = Paragraph(ptype, "")
+            for i in range(300):
+                self.edit(rnd, paragraph, True)
+                self.assertSameLines(paragraph)
+
+    def test_deferred_edits(self):
+        """Test if several edits rewrapped at once end up as a full rewrap."""
+        rnd = random.Random(1)
+        for ptype in PType:
+            paragraph = Paragraph(ptype, "")
+            for i in range(100):
+                for j in range(rnd.randint(1, 5)):
+                    self.edit(rnd, paragraph, False)
+                paragraph.sp_reformat()
+                self.assertSameLines(paragraph)
+
+    def test_type_change(self):
+        """Test if changing type rewraps like a new paragraph."""
+        paragraph = Paragraph(PType.ACTION, "HANS " * 40)
+        for ptype in PType:
+            paragraph.sp_set_type(ptype)
+            self.assertSameLines(paragraph)
+
+
+if __name__ == "__main__":
+    unittest.main()
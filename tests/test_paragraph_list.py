@@ -0,0 +1,150 @@
+# coding=utf-8
+
+# Shane - a poor man and/or hipster's TUI screenwriting software
+# Copyright (C) 2016 Tobias Heukäufer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+import unittest
+
+from shane.fenwick import FenwickTree
+from shane.paragraph import Paragraph, PType
+from shane.paragraph_list import ParagraphList
+
+
+class FenwickTreeTest(unittest.TestCase):
+    """Tests comparing Fenwick trees with plain lists."""
+
+    def assertSameSums(self, tree: FenwickTree, values: list):
+        """Assert tree's sums and lookups match values'."""
+        self.assertEqual(len(tree), len(values))
+        self.assertEqual(tree.total(), sum(values))
+        for index in range(len(values) + 1):
+            self.assertEqual(tree.prefix_sum(index), sum(values[:index]))
+        for value in range(sum(values)):
+            index = 0
+            while sum(values[:index + 1]) <= value:
+                index += 1
+            self.assertEqual(tree.find(value),
+                             (index, value - sum(values[:index])))
+        self.assertRaises(ValueError, tree.find, sum(values))
+        self.assertRaises(ValueError, tree.find, -1)
+
+    def test_add(self):
+        """Test if sums follow values added to."""
+        rnd = random.Random(0)
+        values = [rnd.randint(0, 5) for _ in range(37)]
+        tree = FenwickTree(values)
+        self.assertSameSums(tree, values)
+        for i in range(100):
+            index = rnd.randrange(len(values))
+            delta = rnd.randint(-values[index], 5)
+            values[index] += delta
+            tree.add(index, delta)
+        self.assertSameSums(tree, values)
+
+    def test_rebuild(self):
+        """Test if rebuilt tree only sums up new values."""
+        tree = FenwickTree([3, 1, 4])
+        for values in ([], [0, 0, 2], [1] * 65):
+            tree.rebuild(values)
+            self.assertSameSums(tree, values)
+
+
+class ParagraphListTest(unittest.TestCase):
+    """Tests comparing paragraph lists with plain lists."""
+
+    def setUp(self):
+        """Use tiny blocks so blocks get split and emptied a lot."""
+        block_size = ParagraphList.BLOCK_SIZE
+        ParagraphList.BLOCK_SIZE = 3
+        self.addCleanup(setattr, ParagraphList, "BLOCK_SIZE", block_size)
+        self.rnd = random.Random(0)
+
+    def make_paragraph(self) -> Paragraph:
+        """Return paragraph of random type and length."""
+        return Paragraph(self.rnd.choice(list(PType)),
+                         "word " * self.rnd.randint(0, 30))
+
+    def assertSameParagraphs(self, plist: ParagraphList, paragraphs: list):
+        """Assert paragraph list's contents and indices match paragraphs'."""
+        self.assertEqual(list(plist), paragraphs)
+        self.assertEqual(len(plist), len(paragraphs))
+
+        line = 0
+        for index, paragraph in enumerate(paragraphs):
+            self.assertIs(plist[index], paragraph)
+            self.assertEqual(plist.get_line_offset(index), line)
+            for offset in range(paragraph.get_line_count()):
+                self.assertEqual(plist.find_line(line + offset),
+                                 (index, offset))
+            line += paragraph.get_line_count()
+        self.assertEqual(plist.get_line_count(), line)
+        self.assertRaises(ValueError, plist.find_line, line)
+
+        scenes = [index for index, paragraph in enumerate(paragraphs)
+                  if paragraph.get_type() == PType.SCENE]
+        self.assertEqual(plist.get_scene_count(), len(scenes))
+        self.assertEqual(list(plist.iter_scenes()), scenes)
+        for scene, index in enumerate(scenes):
+            self.assertEqual(plist.find_scene(scene), index)
+        for index in range(len(paragraphs) + 1):
+            self.assertEqual(plist.count_scenes_before(index),
+                             len([s for s in scenes if s < index]))
+
+    def test_edits(self):
+        """Test if random edits keep list and indices right."""
+        paragraphs = [self.make_paragraph() for _ in range(10)]
+        plist = ParagraphList(paragraphs)
+        self.assertSameParagraphs(plist, paragraphs)
+
+        for i in range(200):
+            choice = self.rnd.random()
+            index = self.rnd.randint(0, len(paragraphs))
+            end = self.rnd.randint(index, min(len(paragraphs), index + 8))
+            if choice < 0.2:
+                paragraph = self.make_paragraph()
+                paragraphs.insert(index, paragraph)
+                plist.insert(index, paragraph)
+            elif choice < 0.4:
+                new = [self.make_paragraph()
+                       for _ in range(self.rnd.randint(0, 8))]
+                paragraphs[index:index] = new
+                plist.insert_range(index, new)
+            elif choice < 0.55:
+                self.assertEqual(plist.delete_range(index, end),
+                                 paragraphs[index:end])
+                del paragraphs[index:end]
+            elif choice < 0.7 and index < len(paragraphs):
+                self.assertIs(plist.pop(index), paragraphs.pop(index))
+            elif choice < 0.85:
+                moved = paragraphs[index:end]
+                del paragraphs[index:end]
+                dest = self.rnd.randint(0, len(paragraphs))
+                paragraphs[dest:dest] = moved
+                self.assertEqual(plist.move_range(index, end, dest), moved)
+            elif index < len(paragraphs):
+                paragraph = paragraphs[index]
+                if self.rnd.random() < 0.5:
+                    paragraph.sp_input(0, "word " * self.rnd.randint(0, 30))
+                else:
+                    paragraph.sp_set_type(self.rnd.choice(list(PType)))
+                plist.refresh(index)
+            self.assertSameParagraphs(plist, paragraphs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# coding=utf-8
+
+# Shane - a poor man and/or hipster's TUI screenwriting software
+# Copyright (C) 2016 Tobias Heukäufer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import unittest
+
+from shane.screenplay import Screenplay
+
+
+class UndoMergedDeletesTest(unittest.TestCase):
+    """Tests for undoing merged deletions."""
+
+    def setUp(self):
+        """Open screenplay with cursor at position 5 of its scene heading."""
+        fd, path = tempfile.mkstemp(suffix=".fountain")
+        with os.fdopen(fd, "w") as file:
+            file.write("int. house\n")
+        self.addCleanup(os.remove, path)
+
+        self.screenplay = Screenplay(path)
+        for i in range(5):
+            self.screenplay.do_move_cursor_right()
+
+    def test_undo_forward_deletes(self):
+        """Test if cursor is behind first deleted character after undo."""
+        for i in range(3):
+            self.screenplay.do_delete_forward()
+        self.assertEqual(self.screenplay.get_cursor_paragraph().get_text(),
+                         "int. se\0")
+
+        self.screenplay.do_undo()
+        self.assertEqual(self.screenplay.get_cursor_paragraph().get_text(),
+                         "int. house\0")
+        self.assertEqual(self.screenplay.get_cursor_info()[1], 6)
+
+    def test_undo_backward_deletes(self):
+        """Test if cursor is back where deleting started after undo."""
+        for i in range(3):
+            self.screenplay.do_delete_backward()
+        self.assertEqual(self.screenplay.get_cursor_paragraph().get_text(),
+                         "inhouse\0")
+
+        self.screenplay.do_undo()
+        self.assertEqual(self.screenplay.get_cursor_paragraph().get_text(),
+                         "int. house\0")
+        self.assertEqual(self.screenplay.get_cursor_info()[1], 5)
+
+
+class SelectionTest(unittest.TestCase):
+    """Tests for selecting text."""
+
+    def test_edit_ends_selection(self):
+        """Test if editing text ends selection."""
+        screenplay = Screenplay()
+        screenplay.do_input("int. house")
+        screenplay.do_set_selection()
+        screenplay.do_move_cursor_left()
+        self.assertEqual(screenplay.get_selection(), ((0, 9), (0, 10)))
+
+        screenplay.do_input("s")
+        self.assertIsNone(screenplay.get_selection())
+
+
+if __name__ == "__main__":
+    unittest.main()